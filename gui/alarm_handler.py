@@ -3,11 +3,14 @@ from PyQt5 import QtCore, QtGui, QtWidgets
 
 from messagebox import MessageBox
 from communication.esp32serial import ESP32Alarm, ESP32Warning
+from communication.esp32transport import ESP32Transport
 
 BITMAP = {1 << x: x for x in range(32)}
 ERROR = 0
 WARNING = 1
 
+BACKGROUND_COLORS = {ERROR: 'red', WARNING: 'orange'}
+
 class SnoozeButton:
     '''
     Takes care of snoozing alarms.
@@ -54,6 +57,14 @@ class SnoozeButton:
         '''
         self._alarmsnooze.show()
 
+    def is_showing(self, mode, code):
+        '''
+        Returns True if the button is shown
+        to snooze the given alarm or warning
+        '''
+        return (self._alarmsnooze.isVisible() and
+                self._mode == mode and self._code == code)
+
     def _on_click_snooze(self):
         '''
         The callback function called when the alarm
@@ -66,22 +77,29 @@ class SnoozeButton:
         # Reset the alarms/warnings in the ESP
         # If the ESP connection fails at this
         # time, raise an error box
-        try:
-            if self._mode == ERROR:
-                self._esp32.snooze_hw_alarm(self._code)
-                self._alarm_h.snooze_alarm(self._code)
-            else:
-                self._esp32.reset_warnings()
-                self._alarm_h.snooze_warning(self._code)
-        except Exception as error:
-            msg = MessageBox()
-            fn = msg.critical("Critical",
-                              "Severe hardware communication error",
-                              str(error),
-                              "Communication error",
-                              { msg.Retry: lambda: self.ok_worker(mode),
-                                msg.Abort: lambda: None })
-            fn()
+        code = self._code
+        if self._mode == ERROR:
+            self._esp32.snooze_hw_alarm(code,
+                    callback=lambda result: self._alarm_h.snooze_alarm(code),
+                    errback=self._on_snooze_error)
+        else:
+            self._esp32.reset_warnings(
+                    callback=lambda result: self._alarm_h.snooze_warning(code),
+                    errback=self._on_snooze_error)
+
+    def _on_snooze_error(self, error):
+        '''
+        Called if the ESP failed to snooze
+        the alarm or warning.
+        '''
+        msg = MessageBox()
+        fn = msg.critical("Critical",
+                          "Severe hardware communication error",
+                          str(error),
+                          "Communication error",
+                          { msg.Retry: self._on_click_snooze,
+                            msg.Abort: lambda: None })
+        fn()
 
 class AlarmButton(QtGui.QPushButton):
     '''
@@ -89,31 +107,45 @@ class AlarmButton(QtGui.QPushButton):
     shown in the top alarmbar
     '''
 
-    def __init__(self, mode, code, errstr, label, snooze_btn):
+    def __init__(self, mode, label, snooze_btn):
+        '''
+        Constructor. The button is styled once for its mode,
+        and can then be reused for any code with assign().
+
+        arguments:
+        - mode: ERROR or WARNING
+        - label: the label showing the alarm description
+        - snooze_btn: the SnoozeButton
+        '''
         super(AlarmButton, self).__init__()
         self._mode = mode
-        self._code = code
-        self._errstr = errstr
+        self._code = None
+        self._errstr = ''
         self._label = label
         self._snooze_btn = snooze_btn
 
         self.clicked.connect(self._on_click_event)
 
-        if self._mode == ERROR:
-            self._bkg_color = 'red'
-        elif self._mode == WARNING:
-            self._bkg_color = 'orange'
-        else:
-            raise Exception('Option %s not supported'.format(self._mode))
-
-        self.setText(str(BITMAP[self._code]))
+        if self._mode not in BACKGROUND_COLORS:
+            raise Exception('Option %s not supported' % self._mode)
+        self._bkg_color = BACKGROUND_COLORS[self._mode]
 
         self.setStyleSheet('background-color: %s; color : white; border: 0.5px solid white; font-weight: bold;' % self._bkg_color)
 
         self.setMaximumWidth(35)
         self.setMaximumHeight(30)
 
+    def assign(self, code, errstr):
+        '''
+        Makes the button show an alarm or warning
 
+        arguments:
+        - code: the alarm code (a single bit)
+        - errstr: the alarm description
+        '''
+        self._code = code
+        self._errstr = errstr
+        self.setText(str(BITMAP[code]))
 
     def _on_click_event(self):
         '''
@@ -142,7 +174,11 @@ class AlarmHandler:
     '''
     This class starts a QTimer dedicated
     to checking is there are any errors
-    or warnings coming from ESP32
+    or warnings coming from ESP32.
+    If the alarm and warning words come with
+    the get_all ('get_all_words' in the config),
+    they are passed by the DataHandler instead,
+    and no timer is started.
     '''
 
     def __init__(self, config, esp32, alarmbar):
@@ -161,10 +197,20 @@ class AlarmHandler:
 
         self._alarm_timer = QtCore.QTimer()
         self._alarm_timer.timeout.connect(self.handle_alarms)
-        self._alarm_timer.start(config["alarminterval"] * 1000)
+        words = config.get('get_all_words', [])
+        if 'alarm' not in words or 'warning' not in words:
+            self._alarm_timer.start(config["alarminterval"] * 1000)
 
         self._err_buttons = {}
         self._war_buttons = {}
+        self._buttons = {ERROR: self._err_buttons, WARNING: self._war_buttons}
+        # the alarm and warning bits currently shown
+        self._shown = {ERROR: 0, WARNING: 0}
+        # the hidden buttons, ready to be reused
+        self._pool = {ERROR: [], WARNING: []}
+        self._pending = False
+        # the (alarm, warning) words last shown in the alarm bar
+        self._last_words = None
 
         self._alarmlabel = self._alarmbar.findChild(QtWidgets.QLabel, "alarmlabel")
         self._alarmstack = self._alarmbar.findChild(QtWidgets.QHBoxLayout, "alarmstack")
@@ -184,66 +230,153 @@ class AlarmHandler:
         '''
 
         # Retrieve alarms and warnings from the ESP
-        try:
-            esp32alarm = self._esp32.get_alarms()
-            esp32warning = self._esp32.get_warnings()
-        except Exception as error:
-            esp32alarm = None
-            esp32warning = None
-            err_msg = "Severe hardware communication error. "
-            err_msg += "Cannot retrieve alarm and warning statuses from hardware."
-            msg = MessageBox()
-            fn = msg.critical("Critical",
-                              err_msg,
-                              str(error),
-                              "Communication error",
-                              { msg.Retry: lambda: None,
-                                msg.Abort: lambda: None })
-            fn()
-
-        #
-        # ALARMS
-        #
-        if esp32alarm:
-            errors = esp32alarm.strerror_all()
-            errors_full = esp32alarm.strerror_all(append_err_no=True)
-
-            alarm_codes = esp32alarm.get_alarm_codes()
-
-            for alarm_code, err_str in zip(alarm_codes, errors):
-                if alarm_code not in self._err_buttons:
-                    btn = AlarmButton(ERROR, alarm_code, err_str, self._alarmlabel, self._snooze_btn)
-                    self._alarmstack.addWidget(btn)
-                    self._err_buttons[alarm_code] = btn
-
-        #
-        # WARNINGS
-        #
-        if esp32warning:
-            errors = esp32warning.strerror_all()
-            errors_full = esp32warning.strerror_all(append_err_no=True)
-
-            warning_codes = esp32warning.get_alarm_codes()
-
-            for warning_code, err_str in zip(warning_codes, errors):
-                if warning_code not in self._war_buttons:
-                    btn = AlarmButton(WARNING, warning_code, err_str, self._alarmlabel, self._snooze_btn)
-                    self._alarmstack.addWidget(btn)
-                    self._war_buttons[warning_code] = btn
+        if self._pending:
+            return
 
-    def snooze_alarm(self, code):
+        self._pending = True
+        self._esp32.get_many(['alarm', 'warning'],
+                             callback=self._on_alarms,
+                             errback=self._on_error,
+                             priority=ESP32Transport.PRIORITY_ALARMS)
+
+    def _on_alarms(self, values):
         '''
-        Graphically snoozes alarm corresponding to 'code'
+        Called with the alarm and warning words read
+        from the ESP with a single command.
         '''
-        if code not in self._err_buttons:
-            raise Exception('Cannot snooze code %s as alarm button doesn\'t exist.' % code)
+        self._pending = False
+        self._on_words(int(values['alarm']), int(values['warning']))
+
+    def set_words(self, values):
+        '''
+        Called by the DataHandler with the alarm and
+        warning words received with the get_all.
+        '''
+        self._on_words(int(values['alarm']), int(values['warning']))
+
+    def _on_words(self, alarm, warning):
+        '''
+        Updates the alarm bar only if the alarm or
+        warning word changed since the last update.
+        '''
+        words = (alarm, warning)
+        if words == self._last_words:
+            return
+
+        self._last_words = words
+        self._update_alarmbar(alarm, warning)
+
+    def _on_error(self, error):
+        '''
+        Called if the alarms or warnings cannot be
+        retrieved from the ESP
+        '''
+        self._pending = False
+        err_msg = "Severe hardware communication error. "
+        err_msg += "Cannot retrieve alarm and warning statuses from hardware."
+        msg = MessageBox()
+        fn = msg.critical("Critical",
+                          err_msg,
+                          str(error),
+                          "Communication error",
+                          { msg.Retry: lambda: None,
+                            msg.Abort: lambda: None })
+        fn()
+
+    def _update_alarmbar(self, alarm, warning):
+        '''
+        Updates the alarm bar with the alarms and
+        warnings read from the ESP
+
+        arguments:
+        - alarm: the alarm word
+        - warning: the warning word
+        '''
+        self._reconcile(ERROR, ESP32Alarm(alarm).number, ESP32Alarm)
+        self._reconcile(WARNING, ESP32Warning(warning).number, ESP32Warning)
+
+    def _reconcile(self, mode, mask, alarm_class):
+        '''
+        Adds the buttons of the bits set since the last
+        update and removes the buttons of the bits cleared,
+        leaving the others untouched.
+
+        arguments:
+        - mode: ERROR or WARNING
+        - mask: the bits to show
+        - alarm_class: the class decoding the bits
+        '''
+        shown = self._shown[mode]
+        added = mask & ~shown
+        removed = shown & ~mask
+
+        if removed:
+            for code in alarm_class.decode(removed).codes:
+                self._release(mode, code)
+
+        if added:
+            decoded = alarm_class.decode(added)
+            for code, err_str in zip(decoded.codes, decoded.strings):
+                self._acquire(mode, code, err_str)
+
+        self._shown[mode] = mask
+
+    def _acquire(self, mode, code, err_str):
+        '''
+        Shows a button for an alarm or warning,
+        reusing a pooled one if available
+        '''
+        pool = self._pool[mode]
+        if pool:
+            btn = pool.pop()
+        else:
+            btn = AlarmButton(mode, self._alarmlabel, self._snooze_btn)
+
+        btn.assign(code, err_str)
+        self._alarmstack.addWidget(btn)
+        btn.show()
+        self._buttons[mode][code] = btn
+
+    def _release(self, mode, code):
+        '''
+        Hides the button of an alarm or warning
+        and puts it back in the pool
+        '''
+        btn = self._buttons[mode].pop(code)
+        self._alarmstack.removeWidget(btn)
+        btn.hide()
+        self._pool[mode].append(btn)
+
+        if self._snooze_btn.is_showing(mode, code):
+            self._clear_label()
 
-        self._err_buttons[code].deleteLater()
-        del self._err_buttons[code]
+    def _clear_label(self):
+        '''
+        Clears the alarm label and hides the snooze button
+        '''
         self._alarmlabel.setText('')
         self._alarmlabel.setStyleSheet('QLabel { background-color: black; }')
         self._alarmsnooze.hide()
 
+    def _snooze(self, mode, code):
+        '''
+        Graphically snoozes the alarm or
+        warning corresponding to 'code'
+        '''
+        self._release(mode, code)
+        self._shown[mode] &= ~code
+        self._clear_label()
+        # show the button again if the ESP still reports it
+        self._last_words = None
+
+    def snooze_alarm(self, code):
+        '''
+        Graphically snoozes alarm corresponding to 'code'
+        '''
+        if code not in self._err_buttons:
+            raise Exception('Cannot snooze code %s as alarm button doesn\'t exist.' % code)
+
+        self._snooze(ERROR, code)
 
     def snooze_warning(self, code):
         '''
@@ -252,12 +385,7 @@ class AlarmHandler:
         if code not in self._war_buttons:
             raise Exception('Cannot snooze code %s as warning button doesn\'t exist.' % code)
 
-        self._war_buttons[code].deleteLater()
-        del self._war_buttons[code]
-        self._alarmlabel.setText('')
-        self._alarmlabel.setStyleSheet('QLabel { background-color: black; }')
-        self._alarmsnooze.hide()
-
+        self._snooze(WARNING, code)
 
     def raise_alarm(self):
         '''
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
-from PyQt5 import QtWidgets, uic
+from PyQt5 import QtWidgets
 from PyQt5 import QtGui, QtCore
+from ui_cache import load_ui
 
 
 class AlarmScrollBar(QtWidgets.QScrollBar):
@@ -57,7 +58,7 @@ class Alarms(QtWidgets.QWidget):
         Grabs child widgets.
         """
         super(Alarms, self).__init__(*args)
-        uic.loadUi("alarms/alarms.ui", self)
+        load_ui("alarms/alarms.ui", self)
 
         self.layout          = self.findChild(QtWidgets.QGridLayout, "monitors_layout")
         self.label_alarmname = self.findChild(QtWidgets.QLabel,      "label_alarmname")
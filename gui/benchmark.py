@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+'''
+Benchmarks the rendering of the MainWindow.
+
+The full GUI is built on the offscreen Qt platform, and fed with
+deterministic samples (from a seeded ESP32Simulator, on a simulated
+clock) through the same path as the ESP32 data: the Acquisition, the
+GuiAlarms and the DataFiller. The simulated time runs as fast as the
+GUI can process it: for each render tick the samples of that tick are
+processed, the DataFiller redraws and the window is painted, if
+anything changed.
+
+The time spent in each step is recorded, and the percentiles are
+written to a JSON file, e.g.
+
+```
+python benchmark.py --minutes 5 --sampling-interval 0.01 --nsamples 1000
+python benchmark.py --compare old_results.json benchmark_results.json
+```
+'''
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import subprocess
+from collections import defaultdict
+from functools import wraps
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+from PyQt5 import QtCore, QtWidgets
+import pyqtgraph as pg
+
+from gui_config import Config, load_config
+from log_handler import setup_logging
+from communication.esp32simulator import ESP32Simulator
+from communication.esp32transport import ESP32Transport
+from mainwindow import MainWindow
+
+log = logging.getLogger(__name__)
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class Timings():
+    '''
+    Records the duration of each call of the timed methods.
+
+    Attributes:
+        samples (dict) The list of the durations, in seconds, by name
+    '''
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def wrap(self, obj, method, name=None):
+        '''
+        Replaces a method of an object with a timed one.
+        The callers looking the method up on the object
+        at call time are then timed.
+        '''
+        function = getattr(obj, method)
+        durations = self.samples[name or method]
+
+        @wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                durations.append(time.perf_counter() - start)
+
+        setattr(obj, method, timed)
+
+    def time(self, name, function, *args):
+        '''
+        Calls a function and records its duration
+        '''
+        start = time.perf_counter()
+        result = function(*args)
+        self.samples[name].append(time.perf_counter() - start)
+        return result
+
+    def summary(self):
+        '''
+        Returns, for each name, the count, mean, percentiles
+        and maximum of the durations in microseconds
+        '''
+        result = {}
+        for name, durations in sorted(self.samples.items()):
+            if not durations:
+                continue
+            us = np.array(durations) * 1e6
+            entry = {'count': len(us), 'mean': float(us.mean())}
+            for p in PERCENTILES:
+                entry['p%g' % p] = float(np.percentile(us, p))
+            entry['max'] = float(us.max())
+            result[name] = entry
+        return result
+
+
+class _Running():
+    '''
+    Stands for the StartStopWorker of a running ventilator,
+    so that the alarms are evaluated.
+    '''
+
+    def is_running(self):
+        return True
+
+
+def benchmark_config(settings_file, args):
+    '''
+    Returns the Config of the GUI, with the
+    benchmark parameters applied
+    '''
+    values = dict(load_config(settings_file))
+    values['stream_rate'] = 0
+    if args.sampling_interval is not None:
+        values['sampling_interval'] = args.sampling_interval
+    if args.nsamples is not None:
+        values['nsamples'] = args.nsamples
+    if args.plots is not None:
+        if not 1 <= args.plots <= len(values['plots']):
+            raise SystemExit('--plots must be between 1 and %d' % len(values['plots']))
+        values['plots'] = dict(list(values['plots'].items())[:args.plots])
+    return Config(values)
+
+
+def run(app, config, args):
+    '''
+    Builds the MainWindow and feeds args.minutes of samples,
+    processing the events of the QApplication app.
+
+    returns: the Timings, and the totals of the run
+    '''
+    esp32 = ESP32Transport(ESP32Simulator(config, seed=args.seed), config,
+                           threaded=False)
+    window = MainWindow(config, esp32)
+    window.show()
+    window.goto_main()
+    app.processEvents()
+
+    # The samples come from the benchmark only, and the
+    # plots are redrawn at the simulated render ticks
+    window._data_h._stop_timer()
+    filler = window.data_filler
+    filler._render_timer.stop()
+    window.gui_alarm.connect_workers(_Running())
+    acquisition = window._data_h._acquisition
+
+    timings = Timings()
+    timings.wrap(acquisition, 'process_frame')
+    timings.wrap(window.gui_alarm.engine, 'evaluate', 'alarm_evaluation')
+    timings.wrap(filler, 'add_frame')
+    timings.wrap(filler, 'add_data_point')
+    timings.wrap(filler, 'render')
+    timings.wrap(filler, 'update_plot')
+    timings.wrap(filler, 'update_monitor')
+
+    # the samples are generated apart from the simulator answering
+    # the GUI, whose random draws depend on the wall clock timers
+    generator = ESP32Simulator(config, seed=args.seed)
+    sampling = config['sampling_interval']
+    render_interval = config.get('render_interval', 0.033)
+    duration = args.minutes * 60
+    frame_samples = max(args.frame_samples, 1)
+
+    simulated = 0.
+    total_samples = 0
+    wall = time.perf_counter()
+    cpu = time.process_time()
+
+    while simulated < duration:
+        simulated = min(simulated + render_interval, duration)
+
+        # the samples acquired during this render tick
+        count = int(simulated / sampling) + 1 - total_samples
+        for first in range(0, count, frame_samples):
+            n = min(frame_samples, count - first)
+            start = (total_samples + first) * sampling
+            frame = generator.frame(start, n, sampling)
+            if args.per_point:
+                # the path of the single value producers
+                frame.scale(config.conversion)
+                window.gui_alarm.set_frame(frame)
+                for row in frame.values:
+                    for name, value in zip(frame.fields, row):
+                        filler.add_data_point(name, value)
+            else:
+                acquisition.process_frame(frame)
+        total_samples += count
+
+        # The plots post their changes to the scenes, which are
+        # painted when the events are processed, as in the event loop
+        drawn = bool(filler._dirty)
+        filler.render()
+        if drawn:
+            timings.time('paint', app.processEvents)
+        else:
+            app.processEvents()
+
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+
+    window.close()
+    esp32.stop()
+
+    totals = {
+        'simulated_seconds': duration,
+        'samples': total_samples,
+        'render_ticks': len(timings.samples['render']),
+        'wall_seconds': wall,
+        'cpu_seconds': cpu,
+        'cpu_us_per_sample': cpu / max(total_samples, 1) * 1e6,
+        'realtime_factor': duration / wall if wall else None,
+    }
+    return timings, totals
+
+
+def environment():
+    '''
+    Returns the versions and the revision the results refer to
+    '''
+    try:
+        revision = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+
+    return {
+        'revision': revision,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'qt': QtCore.QT_VERSION_STR,
+        'pyqt': QtCore.PYQT_VERSION_STR,
+        'pyqtgraph': pg.__version__,
+        'numpy': np.__version__,
+        'qpa': os.environ.get('QT_QPA_PLATFORM'),
+    }
+
+
+def compare(old_file, new_file):
+    '''
+    Prints the change of the median and the 99th percentile
+    of each timing between two result files
+    '''
+    with open(old_file) as f:
+        old = json.load(f)
+    with open(new_file) as f:
+        new = json.load(f)
+
+    print('%-18s %12s %12s %8s %12s %12s %8s' %
+          ('', 'old p50', 'new p50', '', 'old p99', 'new p99', ''))
+    for name in sorted(set(old['timings']) | set(new['timings'])):
+        a = old['timings'].get(name)
+        b = new['timings'].get(name)
+        row = [name]
+        for key in ('p50', 'p99'):
+            x = a[key] if a else float('nan')
+            y = b[key] if b else float('nan')
+            row += [x, y, '%+.0f%%' % ((y / x - 1) * 100) if a and b and x else '']
+        print('%-18s %10.1fus %10.1fus %8s %10.1fus %10.1fus %8s' % tuple(row))
+
+    for key in ('cpu_us_per_sample', 'realtime_factor'):
+        print('%-18s %12.1f %12.1f' % (key, old['totals'][key], new['totals'][key]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the rendering of the GUI')
+    parser.add_argument('--minutes', type=float, default=1,
+                        help='the simulated time (default: 1)')
+    parser.add_argument('--sampling-interval', type=float,
+                        help='overrides sampling_interval, in seconds')
+    parser.add_argument('--nsamples', type=int,
+                        help='overrides nsamples, the samples in the plots')
+    parser.add_argument('--plots', type=int,
+                        help='the number of plots shown (default: all)')
+    parser.add_argument('--frame-samples', type=int, default=1,
+                        help='the samples per frame, 1 as when polling, '
+                             'more as when streaming (default: 1)')
+    parser.add_argument('--per-point', action='store_true',
+                        help='feed the samples one value at a time '
+                             'with add_data_point')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='the seed of the simulated data (default: 0)')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='the results file (default: benchmark_results.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two results files and exit')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    # the GUI files are looked up from the gui directory,
+    # the results are written from the current one
+    output = os.path.abspath(args.output)
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(base_dir)
+    config = benchmark_config(os.path.join(base_dir, 'default_settings.yaml'), args)
+    log_listener, log_ring = setup_logging(config)
+
+    # the QApplication must be referenced for the whole run
+    app = QtWidgets.QApplication(sys.argv[:1])
+    timings, totals = run(app, config, args)
+
+    results = {
+        'parameters': {
+            'minutes': args.minutes,
+            'sampling_interval': config['sampling_interval'],
+            'nsamples': config['nsamples'],
+            'render_interval': config.get('render_interval', 0.033),
+            'plots': len(config['plots']),
+            'frame_samples': args.frame_samples,
+            'per_point': args.per_point,
+            'seed': args.seed,
+        },
+        'environment': environment(),
+        'totals': totals,
+        'timings': timings.summary(),
+    }
+
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print('%-18s %8s %10s %10s %10s %10s' % ('', 'count', 'mean', 'p50', 'p99', 'max'))
+    for name, entry in results['timings'].items():
+        print('%-18s %8d %8.1fus %8.1fus %8.1fus %8.1fus' %
+              (name, entry['count'], entry['mean'], entry['p50'],
+               entry['p99'], entry['max']))
+    print('%.1f us CPU per sample, %.1fx real time, results in %s' %
+          (totals['cpu_us_per_sample'], totals['realtime_factor'], output))
+
+    log_listener.stop()
+
+
+if __name__ == '__main__':
+    main()
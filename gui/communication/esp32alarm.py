@@ -1,3 +1,41 @@
+import logging
+from functools import lru_cache
+from collections import namedtuple
+
+log = logging.getLogger(__name__)
+
+# The number of decoded bitmasks kept, per alarm class
+DECODE_CACHE_SIZE = 256
+
+DecodedAlarms = namedtuple('DecodedAlarms', ['number', 'codes', 'strings', 'strings_full'])
+DecodedAlarms.__doc__ = '''
+The alarms set in a bitmask, decoded once: the alarm codes (the set
+bits, lowest first), their descriptions and their descriptions with
+the code appended. All the fields are immutable, so that the same
+instance can be shared by all the users of a bitmask.
+'''
+
+
+@lru_cache(maxsize=DECODE_CACHE_SIZE)
+def _decode(alarm_class, number):
+    '''
+    Decodes a bitmask, cached by class and number
+
+    arguments:
+    - alarm_class: the ESP32BaseAlarm subclass giving the descriptions
+    - number: the (normalized) bitmask
+    '''
+    codes = tuple(1 << bit for bit in range(32) if number & (1 << bit))
+    log.debug('Found alarms %s', codes)
+
+    strings = tuple(alarm_class.alarm_to_string.get(n, 'Unknown error')
+                    for n in codes)
+    strings_full = tuple('%s (code: %d)' % (s, n)
+                         for s, n in zip(strings, codes))
+
+    return DecodedAlarms(number, codes, strings, strings_full)
+
+
 class ESP32BaseAlarm:
     '''
     The base ESP Alarm Class
@@ -22,25 +60,37 @@ class ESP32BaseAlarm:
     def __str__(self):
         return 'All alarms: ' + ' - '.join(self.strerror_all())
 
-    def get_alarm_codes(self):
+    @classmethod
+    def decode(cls, number):
+        '''
+        Returns the DecodedAlarms of a number obtained from the ESP.
+        The result is cached, so a poll returning the same number as
+        the previous ones costs a dictionary lookup.
 
-        if not hasattr(self, 'alarms'):
-            return self.unpack()
-            
-        return self.alarms
+        arguments:
+        - number: the number obtained from the ESP
+        '''
+        return cls(number).decoded()
 
-    def unpack(self):
+    def decoded(self):
         '''
-        Unpacks the number obtained from the ESP
+        Returns the DecodedAlarms of this number
         '''
+        return _decode(type(self), self.number)
 
-        self.alarms = list(filter(lambda x: x, [ self.number & (1<<test) for test in range(32)]))
-
-        print('Found alarms', self.alarms)
+    def get_alarm_codes(self):
+        '''
+        Returns the list of the alarm codes
+        '''
+        return list(self.decoded().codes)
 
+    def unpack(self):
+        '''
+        Unpacks the number obtained from the ESP
+        '''
+        self.alarms = self.get_alarm_codes()
         return self.alarms
 
-
     def strerror(self, n):
         '''
         Returns a string with the error
@@ -49,13 +99,7 @@ class ESP32BaseAlarm:
         arguments:
         - n: the error number (unpacked)
         '''
-        if not hasattr(self, 'alarms'):
-            self.unpack()
-
-        if n in self.alarm_to_string:
-            return self.alarm_to_string[n]
-        else:
-            return 'Unknown error'
+        return self.alarm_to_string.get(n, 'Unknown error')
 
     def strerror_all(self, append_err_no=False):
         '''
@@ -65,22 +109,10 @@ class ESP32BaseAlarm:
         arguments:
         - append_err_no: if True, also adds the err number
         '''
-        if not hasattr(self, 'alarms'):
-            self.unpack()
-
-        str_error = []
-        for n in self.alarms:
-
-            s = self.strerror(n)
-
-            if append_err_no:
-                s += ' (code: '
-                s += str(n)
-                s += ')'
-
-            str_error.append(s)
-
-        return str_error
+        decoded = self.decoded()
+        if append_err_no:
+            return list(decoded.strings_full)
+        return list(decoded.strings)
 
 
 
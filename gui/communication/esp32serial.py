@@ -3,12 +3,49 @@ Library to interface with the ESP32
 """
 
 from threading import Lock
+from contextlib import contextmanager
+import binascii
+import logging
+import struct
+import time
 import serial # pySerial
 from . import ESP32Alarm, ESP32Warning
+from .samplering import SampleRing
+from .linkstats import LinkStats
 
 __all__ = ("ESP32Serial", "ESP32Exception")
 
 
+# Binary get_all frame:
+#   0xAA 0x55 | length (uint16 LE) | float32 LE values |
+#   uint32 LE words (alarm, warning) | CRC16 (LE)
+# the CRC16 (CCITT, polynomial 0x1021, initial value 0xFFFF) covers the
+# length and the payload.
+FRAME_SYNC = b'\xaa\x55'
+FRAME_HEADER_SIZE = 4
+FRAME_CRC_SIZE = 2
+
+# Streamed frame, pushed by the ESP32 after 'set stream <rate>':
+#   0xAA 0x56 | length (uint16 LE) | timestamp in ms (uint32 LE) |
+#   float32 LE values | uint32 LE words | CRC16 (LE)
+STREAM_SYNC = b'\xaa\x56'
+
+log = logging.getLogger(__name__)
+
+
+def crc16(data):
+    """
+    Computes the CRC16-CCITT of a binary buffer
+
+    arguments:
+    - data           the binary buffer
+
+    returns: the CRC as an integer
+    """
+
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
 class ESP32Exception(Exception):
     """
     Exception class for decoding and hardware failures.
@@ -33,6 +70,13 @@ class ESP32Exception(Exception):
 
 
 
+class _ReadTimeout(Exception):
+    """
+    Raised when the ESP32 reply is missing or incomplete.
+    """
+
+
+
 class ESP32Serial:
     """
     Main class for interfacing with the ESP32 via a serial connection.
@@ -48,28 +92,77 @@ class ESP32Serial:
         - config         the configuration object containing at least the
                          "port" and "get_all_fields" keys
 
+        optional configuration keys:
+        - command_timeout   the maximum time in seconds to complete a
+                            command, retries included, default 1
+        - command_attempts  the maximum number of times a command is
+                            sent, default 3
+        - read_timeout      the read() timeout in seconds, default 0.1
+        - esp_settable_param  the settable parameters, whose last
+                            acknowledged value is mirrored so that
+                            unchanged values are not sent again
+        - return_success_code  the ESP32 reply to a successful set,
+                            default "OK"
+        - get_all_words     the integer words (e.g. alarm and warning)
+                            replied by the get_all after the
+                            get_all_fields, default none
+
         named arguments:
         - any argument available for the serial.Serial pySerial class
         - baudrate       the preferred baudrate, default 115200
         - terminator     the line terminator, binary encoded, default
                          b'\n'
-        - timeout        sets the read() timeout in seconds
+        - timeout        sets the read() timeout in seconds, overrides
+                         read_timeout
         """
 
         self.lock = Lock()
 
+        self.command_timeout = config.get("command_timeout", 1)
+        self.command_attempts = config.get("command_attempts", 3)
+
+        # link instrumentation: counters and latency histograms
+        self.stats = LinkStats()
+
+        # mirror of the device state: the last value acknowledged by the
+        # ESP32 to a set of each settable parameter, as string. The values
+        # read back are not mirrored: some (e.g. pause_lg_time) read back
+        # a state other than the set value. The mirror starts empty with
+        # each connection, and is cleared after a failed command, as the
+        # ESP32 may have been reset
+        self.mirrored = set(config.get("esp_settable_param", {}).values())
+        self.success_code = config.get("return_success_code", "OK")
+        self._mirror = {}
+        self._dirty = False
+        self._last_reply = b""
+
         baudrate = kwargs["baudrate"] if "baudrate" in kwargs else 115200
-        timeout = kwargs["timeout"] if "timeout" in kwargs else 1
+        timeout = kwargs["timeout"] if "timeout" in kwargs else config.get("read_timeout", 0.1)
         self.term = kwargs["terminator"] if "terminator" in kwargs else b'\n'
         self.connection = serial.Serial(port=config["port"],
                                         baudrate=baudrate, timeout=timeout,
                                         **kwargs)
 
         self.get_all_fields = config["get_all_fields"]
+        self.get_all_words = config.get("get_all_words", [])
+        self.all_fields = self.get_all_fields + self.get_all_words
+        formats = (len(self.get_all_fields), len(self.get_all_words))
+        self._frame_format = struct.Struct('<%df%dI' % formats)
+        self._stream_format = struct.Struct('<I%df%dI' % formats)
 
-        while self.connection.read():
+        self.streaming = False
+        self.stream = SampleRing(self.all_fields)
+
+        while self._read():
             pass
 
+        self.multiple_get = True
+        self.multiple_get = self._negotiate_get_many()
+
+        self.binary = False
+        if config.get("use_binary_frames", False):
+            self.binary = self._negotiate_binary()
+
     def __del__(self):
         """
         Destructor.
@@ -81,6 +174,373 @@ class ESP32Serial:
             if hasattr(self, "connection"):
                 self.connection.close()
 
+    @contextmanager
+    def _locked(self):
+        """
+        Acquires the link lock, recording the time spent waiting for it
+        """
+
+        start = time.monotonic()
+        with self.lock:
+            self.stats.record_lock_wait(time.monotonic() - start)
+            yield
+
+    def _read(self, size=1):
+        """
+        Reads from the serial port, counting the bytes received
+
+        arguments:
+        - size           the number of bytes to read
+
+        returns: the bytes read, possibly fewer on timeout
+        """
+
+        data = self.connection.read(size)
+        self.stats.bytes_in += len(data)
+        return data
+
+    def _read_until(self):
+        """
+        Reads from the serial port up to the line terminator, counting the
+        bytes received
+
+        returns: the bytes read, possibly not terminated on timeout
+        """
+
+        data = self.connection.read_until(terminator=self.term)
+        self.stats.bytes_in += len(data)
+        return data
+
+    def _write(self, data):
+        """
+        Writes to the serial port, counting the bytes sent
+
+        arguments:
+        - data           the binary buffer to send
+        """
+
+        self.stats.bytes_out += len(data)
+        self.connection.write(data)
+
+    def _reset_input(self):
+        """
+        Drops the serial input buffer, counting the bytes dropped as
+        received
+        """
+
+        self.stats.bytes_in += self.connection.in_waiting
+        self.connection.reset_input_buffer()
+
+    def _negotiate_binary(self):
+        """
+        Asks the ESP32 whether it supports the binary get_all frames.
+        The ESP32 is expected to reply to 'get binary' with the number of
+        fields it packs in a frame. Any other reply (e.g. from a firmware
+        not supporting it) leaves the ASCII protocol in use.
+
+        returns: True if the binary frames can be used
+        """
+
+        try:
+            nfields = int(self.get("binary"))
+        except Exception as exc:
+            log.warning("binary frames not supported, using ASCII: %s", exc)
+            return False
+
+        if nfields != len(self.all_fields):
+            log.warning("binary frames with %d fields, %d expected, using ASCII",
+                        nfields, len(self.all_fields))
+            return False
+
+        return True
+
+    def _read_before(self, size, deadline):
+        """
+        Reads from the serial port, retrying the reads that time out
+        until the deadline
+
+        arguments:
+        - size           the number of bytes to read
+        - deadline       the time.monotonic() value by which the bytes
+                         must be received, None for a single read
+
+        returns: the bytes read, possibly fewer if deadline is None
+        """
+
+        data = self._read(size)
+        while deadline is not None and len(data) < size:
+            if time.monotonic() > deadline:
+                self._last_reply = data
+                raise _ReadTimeout("timeout, received: %s" % data)
+            data += self._read(size - len(data))
+        return data
+
+    def _negotiate_get_many(self):
+        """
+        Checks whether the ESP32 supports the get_many command, asking for
+        two parameters: a firmware not supporting it replies a single
+        value, or nothing.
+
+        returns: True if get_many can be used
+        """
+
+        try:
+            self.get_many(["run", "mode"])
+        except Exception as exc:
+            log.warning("get_many not supported, using get: %s", exc)
+            return False
+
+        return True
+
+    def _read_frame(self, sync=FRAME_SYNC, start=b"", deadline=None):
+        """
+        Reads a binary frame from the ESP32
+
+        arguments:
+        - sync           the expected synchronization bytes
+        - start          the beginning of the frame, if already read
+        - deadline       the time.monotonic() value by which the frame
+                         must be received, None to wait one read timeout
+                         for each part of the frame
+
+        returns: the payload of the frame as a binary buffer
+        """
+
+        header = start + self._read_before(FRAME_HEADER_SIZE - len(start), deadline)
+        if len(header) != FRAME_HEADER_SIZE or header[:2] != sync:
+            raise Exception("frame error: bad header %s" % header)
+
+        length, = struct.unpack('<H', header[2:])
+        body = self._read_before(length + FRAME_CRC_SIZE, deadline)
+        if len(body) != length + FRAME_CRC_SIZE:
+            raise _ReadTimeout("frame error: truncated frame")
+
+        self._last_reply = header + body
+        payload = body[:length]
+        crc, = struct.unpack('<H', body[length:])
+        if crc != crc16(header[2:] + payload):
+            raise Exception("frame error: CRC mismatch")
+
+        return payload
+
+    def _get_all_binary(self, deadline):
+        """
+        Reads the observables from a binary frame.
+
+        arguments:
+        - deadline       the time.monotonic() value by which the frame
+                         must be received
+
+        returns: a dict with the get_all_fields as keys and float values,
+                 and the get_all_words as keys and integer values.
+        """
+
+        payload = self._read_frame(deadline=deadline)
+        values = self._frame_format.unpack(payload)
+        return dict(zip(self.all_fields, values))
+
+    def _read_stream_frame(self, start=b""):
+        """
+        Reads a streamed frame and appends the sample to the stream ring
+        buffer. A corrupted frame is discarded flushing the input buffer.
+
+        arguments:
+        - start          the beginning of the frame, if already read
+        """
+
+        try:
+            payload = self._read_frame(STREAM_SYNC, start)
+            sample = self._stream_format.unpack(payload)
+            self.stream.append(sample[0] / 1000., sample[1:])
+        except Exception as exc:
+            log.error("stream frame discarded: %s", exc)
+            self._reset_input()
+
+    def _readline(self, deadline):
+        """
+        Reads a line replied by the ESP32. While streaming, the frames
+        pushed by the ESP32 before the reply are stored in the stream ring
+        buffer.
+
+        arguments:
+        - deadline       the time.monotonic() value by which the line
+                         must be received
+
+        returns: the line as a binary buffer
+        """
+
+        line = b""
+        while True:
+            if time.monotonic() > deadline:
+                self._last_reply = line
+                raise _ReadTimeout("timeout, received: %s" % line)
+
+            if self.streaming and not line:
+                first = self._read()
+                if first == STREAM_SYNC[:1]:
+                    self._read_stream_frame(first)
+                    continue
+                line = first
+
+            if not line.endswith(self.term):
+                line += self._read_until()
+
+            if line.endswith(self.term):
+                self._last_reply = line
+                return line
+
+    def _resync(self, deadline):
+        """
+        Discards whatever is waiting on the serial input, so that the next
+        line read is the reply to the next command. After a failed command,
+        waits (up to one read timeout) for its possible late reply too.
+        While streaming, the pushed frames are kept.
+
+        arguments:
+        - deadline       the time.monotonic() value not to be exceeded
+        """
+
+        if self._dirty:
+            # the failure may come from an ESP32 reset: its state is unknown
+            self._mirror.clear()
+            self.stats.resyncs += 1
+            quiet = min(time.monotonic() + self.connection.timeout, deadline)
+            while time.monotonic() < quiet:
+                if not self.connection.in_waiting:
+                    time.sleep(0.005)
+                    continue
+                quiet = min(time.monotonic() + self.connection.timeout, deadline)
+                self._discard_input()
+            self._dirty = False
+
+        self._discard_input()
+
+    def _discard_input(self):
+        """
+        Drops the bytes waiting on the serial input. While streaming, the
+        complete frames are stored and only the rest is dropped.
+        """
+
+        if not self.streaming:
+            self._reset_input()
+            return
+
+        while self.connection.in_waiting:
+            first = self._read()
+            if first == STREAM_SYNC[:1]:
+                self._read_stream_frame(first)
+
+    def _transact(self, verb, command, read_reply):
+        """
+        Sends a command and reads its reply within the command_timeout.
+        If the reply is missing or malformed, the input is resynchronized
+        and the command sent again, up to command_attempts times: each
+        attempt waits for the reply at most its share of the
+        command_timeout, so that a lost reply leaves time to retry.
+
+        arguments:
+        - verb           the verb, used for the counters and the errors
+        - command        the command line, binary encoded
+        - read_reply     a function reading and decoding the reply, it
+                         takes the deadline as argument
+
+        returns: the value returned by read_reply
+        """
+
+        start = time.monotonic()
+        deadline = start + self.command_timeout
+        self._last_reply = b""
+
+        for attempt in range(self.command_attempts):
+            if attempt:
+                if time.monotonic() > deadline:
+                    break
+                self.stats.retries[verb] += 1
+
+            self._resync(deadline)
+            self._write(command)
+            attempt_deadline = min(deadline, time.monotonic() +
+                                   self.command_timeout / self.command_attempts)
+            try:
+                result = read_reply(attempt_deadline)
+            except _ReadTimeout as exc:
+                self._dirty = True
+                self.stats.timeouts[verb] += 1
+                log.warning("%s failing: %r %s", verb, self._last_reply, exc)
+            except Exception as exc:
+                self._dirty = True
+                self.stats.parse_failures[verb] += 1
+                log.warning("%s failing: %r %s", verb, self._last_reply, exc)
+            else:
+                self.stats.record_call(verb, time.monotonic() - start, True)
+                return result
+
+        self.stats.record_call(verb, time.monotonic() - start, False)
+        raise ESP32Exception(verb, command.decode().strip(),
+                             self._last_reply.decode(errors="replace"))
+
+    def link_stats(self):
+        """
+        Returns the link instrumentation
+
+        returns: a dict with the calls, retries, timeouts, parse failures
+                 and failures per verb, the latency histograms per verb,
+                 the number of input resynchronizations, the bytes
+                 transferred and the time spent waiting for the lock.
+                 See LinkStats.snapshot.
+        """
+
+        return self.stats.snapshot()
+
+    def poll_stream(self):
+        """
+        Reads the frames pushed by the ESP32 and already available on the
+        serial port, without waiting for new ones.
+        """
+
+        with self._locked():
+            while self.streaming and self.connection.in_waiting:
+                # anything else than a frame here is garbage
+                first = self._read()
+                if first == STREAM_SYNC[:1]:
+                    self._read_stream_frame(first)
+
+    def start_stream(self, rate):
+        """
+        Asks the ESP32 to push the get_all values at the given rate. The
+        samples are collected in the 'stream' ring buffer by poll_stream.
+        Streaming requires the binary frames.
+
+        arguments:
+        - rate           the number of samples per second
+
+        returns: True if the ESP32 started streaming, False otherwise.
+        """
+
+        if not self.binary:
+            return False
+
+        self.stream.clear()
+        self.streaming = True
+        try:
+            self.streaming = self.set("stream", rate) == self.success_code
+        except:
+            self.streaming = False
+            raise
+
+        return self.streaming
+
+    def stop_stream(self):
+        """
+        Stops the ESP32 streaming.
+
+        returns: an "OK" string in case of success.
+        """
+
+        result = self.set("stream", 0)
+        self.streaming = False
+        return result
+
     def _parse(self, result):
         """
         Parses the message from ESP32
@@ -110,25 +570,24 @@ class ESP32Serial:
         returns: an "OK" string in case of success.
         """
 
-        print("ESP32Serial-DEBUG: set %s %s" % (name, value))
+        log.debug("set %s %s", name, value)
+
+        with self._locked():
+            if name in self.mirrored and self._mirror.get(name) == str(value):
+                self.stats.mirror_hits += 1
+                return self.success_code
 
-        with self.lock:
             # I know about Python 3.7 magic string formatting capability
             # but I don't really remember now the version running on
             # Raspbian
             command = 'set ' + name + ' ' + str(value) + '\r\n'
-            self.connection.write(command.encode())
-
-            result = b""
-            retry = 10
-            while retry:
-                retry -= 1
-                try:
-                    result = self.connection.read_until(terminator=self.term)
-                    return self._parse(result)
-                except Exception as exc:
-                    print("ERROR: set failing: %s %s" % (result.decode(), str(exc)))
-            raise ESP32Exception("set", command, result.decode())
+            self._mirror.pop(name, None)
+            result = self._transact("set", command.encode(),
+                    lambda deadline: self._parse(self._readline(deadline)))
+
+            if name in self.mirrored and result == self.success_code:
+                self._mirror[name] = str(value)
+            return result
 
     def set_watchdog(self):
         """
@@ -149,52 +608,74 @@ class ESP32Serial:
         returns: the requested value
         """
 
-        print("ESP32Serial-DEBUG: get %s" % name)
+        log.debug("get %s", name)
 
-        with self.lock:
+        with self._locked():
             command = 'get ' + name + '\r\n'
-            self.connection.write(command.encode())
-
-            result = b""
-            retry = 10
-            while retry:
-                retry -= 1
-                try:
-                    result = self.connection.read_until(terminator=self.term)
-                    return self._parse(result)
-                except Exception as exc:
-                    print("ERROR: get failing: %s %s" % (result.decode(), str(exc)))
-            raise ESP32Exception("get", command, result.decode())
+            value = self._transact("get", command.encode(),
+                    lambda deadline: self._parse(self._readline(deadline)))
+            return value
+
+    def _parse_values(self, names, deadline):
+        """
+        Reads a reply made of comma separated values
+
+        arguments:
+        - names          the names of the expected values
+        - deadline       the time.monotonic() value by which the reply
+                         must be received
+
+        returns: a dict with names as keys and values as strings.
+        """
+
+        values = self._parse(self._readline(deadline)).split(',')
+
+        if len(values) != len(names):
+            raise Exception("answer mismatch: expected: %s, got %s" % (names, values))
+
+        return dict(zip(names, values))
+
+    def get_many(self, names):
+        """
+        Get several parameters with a single command
+
+        arguments:
+        - names          a list of parameter names
+
+        returns: a dict with the requested names as keys and values as
+        strings.
+        """
+
+        log.debug("get_many %s", names)
+
+        if not self.multiple_get:
+            # one get per parameter, on a firmware without get_many
+            return {name: self.get(name) for name in names}
+
+        with self._locked():
+            command = 'get_many ' + ' '.join(names) + '\r\n'
+            values = self._transact("get_many", command.encode(),
+                    lambda deadline: self._parse_values(names, deadline))
+            return values
 
     def get_all(self):
         """
         Get the observables as listed in the get_all_fields internal
-        object.
+        object, followed by the get_all_words.
 
         returns: a dict with member keys as written above and values as
-        strings.
+        strings (as numbers if the binary frames are in use).
         """
 
-        print("ESP32Serial-DEBUG: get all")
+        log.debug("get all")
 
-        with self.lock:
-            self.connection.write(b"get all\r\n")
-
-            result = b""
-            retry = 10
-            while retry:
-                retry -= 1
-                try:
-                    result = self.connection.read_until(terminator=self.term)
-                    values = self._parse(result).split(',')
-
-                    if len(values) != len(self.get_all_fields):
-                        raise Exception("get_all answer mismatch: expected: %s, got %s" % (self.get_all_fields, values))
-
-                    return dict(zip(self.get_all_fields, values))
-                except Exception as exc:
-                    print("ERROR: get failing: %s %s" % (result.decode(), str(exc)))
-            raise ESP32Exception("get", "get all", result.decode())
+        with self._locked():
+            if self.binary:
+                return self._transact("get all", b"get all_bin\r\n",
+                                      self._get_all_binary)
+
+            return self._transact("get all", b"get all\r\n",
+                    lambda deadline: self._parse_values(self.all_fields, deadline))
 
     def get_alarms(self):
         """
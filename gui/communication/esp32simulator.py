@@ -0,0 +1,446 @@
+"""
+A simulated ESP32, without Qt, that can be used in place of ESP32Serial
+when the hardware is not available: by the GUI, by the headless core, in
+load tests and benchmarks.
+"""
+
+import time
+import logging
+import numpy as np
+from .peep import peep
+from .esp32alarm import ESP32Alarm, ESP32Warning
+from .samplering import SampleRing
+from .sampleframe import SampleFrame
+
+__all__ = ("ESP32Simulator",)
+
+log = logging.getLogger(__name__)
+
+# the random observables: (low, high, integer) of the uniform distribution
+UNIFORM_RANGES = {
+    "battery_charge": (0, 100, True),
+    "tidal": (1000, 1500, False),
+    "peep": (4, 20, False),
+    "temperature": (10, 50, False),
+    "battery_powered": (0, 1.5, True),
+}
+DEFAULT_RANGE = (10, 100, False)
+
+
+class ESP32Simulator:
+    """
+    Simulates the ESP32 replies, with the same methods as ESP32Serial.
+
+    The observables are generated in blocks, one numpy operation per
+    block, from a seeded random generator: the pressure and the flow
+    follow the breath model of simulation.yaml, at the set rate and
+    ratio, the others are uniform random values, unless fixed with
+    set_fixed(). The same seed and the same sample times give the same
+    samples.
+
+    The simulator is driven by one thread at a time (the transport one);
+    a front end, like the FakeESP32Serial panel, may change the settings,
+    the fixed values and the alarms from another thread.
+    """
+
+    def __init__(self, config, seed=None, clock=time.monotonic):
+        """
+        Constructor
+
+        arguments:
+        - config         the configuration dictionary, the
+                         'get_all_fields' and 'get_all_words' are used
+        - seed           the random generator seed, None for a random one
+        - clock          the function returning the current time in
+                         seconds, used to timestamp the samples of
+                         get_all and of the stream
+        """
+
+        self.get_all_fields = list(config["get_all_fields"])
+        self.get_all_words = list(config.get("get_all_words", []))
+        self.all_fields = self.get_all_fields + self.get_all_words
+
+        self._rng = np.random.default_rng(seed)
+        self._clock = clock
+        self._t0 = clock()
+
+        self.breath = peep()
+        self._cycle_start = None
+
+        self.set_params = {
+            "run": 0,
+            "mode": 0,
+            "backup": 0,
+            "alarm": 0,
+            "warning": 0,
+            "temperature": 40,
+            "rate": 17.0,
+            "ratio": 2/3,
+            "ptarget": 37.7,
+            "pcv_trigger_enable": 1,
+            "pcv_trigger": 7,
+            "assist_ptrigger": 7.0,
+            "assist_flow_min": 47.0,
+            "pressure_support": 27.,
+            "backup_min_time": 17.0,
+            "backup_enable": 1,
+            "pause_lg_p": 37,
+            "pause_lg_time": 7.0}
+        self._lung_recruit_stop_time = 0
+        self._set_timing()
+
+        # the observables with a fixed value instead of a random one
+        self.fixed = {}
+
+        # the columns of the random observables and their distribution
+        ranges = [UNIFORM_RANGES.get(name, DEFAULT_RANGE)
+                  for name in self.get_all_fields]
+        self._low = np.array([r[0] for r in ranges], dtype=float)
+        self._high = np.array([r[1] for r in ranges], dtype=float)
+        self._integer = np.array([r[2] for r in ranges], dtype=bool)
+        self._pressure = self._column("pressure")
+        self._flow = self._column("flow")
+
+        self.streaming = False
+        self.stream = SampleRing(self.all_fields)
+        self._stream_interval = None
+        self._stream_next = 0
+
+        # called with a description of the commands affecting the
+        # alarms, e.g. by a front end
+        self.log_callback = None
+
+    def _column(self, name):
+        """
+        returns: the column of an observable, None if not a get_all field
+        """
+
+        return self.get_all_fields.index(name) if name in self.get_all_fields else None
+
+    def now(self):
+        """
+        returns: the simulated time, in seconds since the simulator
+                 was created
+        """
+
+        return self._clock() - self._t0
+
+    def _log(self, message):
+        log.debug(message)
+        if self.log_callback is not None:
+            self.log_callback(message)
+
+    def set_fixed(self, name, value):
+        """
+        Fixes the value of an observable
+
+        arguments:
+        - name           the observable
+        - value          its value, None to generate random values again
+        """
+
+        if value is None:
+            self.fixed.pop(name, None)
+        else:
+            self.fixed[name] = value
+
+    def _breath_times(self, times):
+        """
+        Returns the times since the start of the breath cycle of each
+        sample. A cycle restarts at the end of the previous one, with a
+        random delay (or advance).
+        """
+
+        if self._cycle_start is None:
+            self._cycle_start = times[0]
+
+        period = self.breath.period
+        result = times - self._cycle_start
+        first = 0
+        while first < len(times):
+            # the first sample past the end of the current cycle
+            end = first + np.searchsorted(result[first:], period)
+            if end >= len(times):
+                break
+            self._cycle_start += period + \
+                self._rng.normal(scale=self.breath.btiming_fluctuations)
+            first = end
+            result[first:] = times[first:] - self._cycle_start
+
+        return result
+
+    def generate(self, times):
+        """
+        Generates the get_all values at the given times
+
+        arguments:
+        - times          the increasing array of the sample times,
+                         in seconds
+
+        returns: the (samples x all_fields) array of the values
+        """
+
+        times = np.asarray(times, dtype=float)
+        count = len(times)
+        values = np.empty((count, len(self.all_fields)))
+        if count == 0:
+            return values
+
+        self.breath.refresh()
+
+        n_fields = len(self.get_all_fields)
+        observables = values[:, :n_fields]
+        observables[:] = self._rng.uniform(self._low, self._high, (count, n_fields))
+        observables[:, self._integer] = np.floor(observables[:, self._integer])
+
+        if self._pressure is not None or self._flow is not None:
+            pressure, flow = self.breath.waveform(self._breath_times(times))
+            if self._pressure is not None:
+                observables[:, self._pressure] = pressure + self._rng.normal(
+                    scale=self.breath.pressure_noise, size=count)
+            if self._flow is not None:
+                observables[:, self._flow] = flow + self._rng.normal(
+                    scale=self.breath.flow_noise, size=count)
+
+        # a copy, as the front end may change the fixed values meanwhile
+        for name, value in list(self.fixed.items()):
+            column = self._column(name)
+            if column is not None:
+                observables[:, column] = value
+
+        for i, name in enumerate(self.get_all_words):
+            values[:, n_fields + i] = int(self.set_params.get(name, 0))
+
+        return values
+
+    def frame(self, start, count, interval):
+        """
+        Generates a block of samples
+
+        arguments:
+        - start          the time of the first sample, in seconds
+        - count          the number of samples
+        - interval       the time between two samples, in seconds
+
+        returns: a SampleFrame with the get_all values
+        """
+
+        times = start + np.arange(count) * interval
+        return SampleFrame(self.all_fields, times, self.generate(times))
+
+    def set(self, name, value):
+        """
+        Set command wrapper
+
+        arguments:
+        - name           the parameter name as a string
+        - value          the value to assign to the variable as any type
+                         convertible to string
+
+        returns: an "OK" string in case of success.
+        """
+
+        log.debug("set %s %s", name, value)
+
+        if name == 'pause_lg' and int(value) == 1:
+            self._lung_recruit_stop_time = self.now() + self.set_params["pause_lg_time"]
+
+        self.set_params[name] = value
+        if name in ('rate', 'ratio'):
+            self._set_timing()
+        return "OK"
+
+    def _set_timing(self):
+        """
+        The simulated breath follows the rate and ratio settings
+        """
+
+        self.breath.set_timing(float(self.set_params["rate"]),
+                               float(self.set_params["ratio"]))
+
+    def set_watchdog(self):
+        """
+        Set the watchdog polling command
+
+        returns: an "OK" string in case of success.
+        """
+
+        return self.set("watchdog_reset", 1)
+
+    def get(self, name):
+        """
+        Get command wrapper
+
+        arguments:
+        - name           the parameter name as a string
+
+        returns: the requested value
+        """
+
+        log.debug("get %s", name)
+
+        if name in self.get_all_fields:
+            values = self.generate([self.now()])[0]
+            retval = values[self.all_fields.index(name)]
+        elif name == 'pause_lg_time':
+            retval = max(self._lung_recruit_stop_time - self.now(), 0)
+        elif name in self.set_params:
+            retval = self.set_params[name]
+        else:
+            retval = int(self._rng.uniform(10, 100))
+
+        return str(retval)
+
+    def get_many(self, names):
+        """
+        Get several parameters with a single command
+
+        arguments:
+        - names          a list of parameter names
+
+        returns: a dict with the requested names as keys and values as
+        strings.
+        """
+
+        log.debug("get_many %s", names)
+
+        return {name: self.get(name) for name in names}
+
+    def get_all(self):
+        """
+        Get the get_all_fields observables, followed by the
+        get_all_words, at once and in this order.
+
+        returns: a dict with member keys as written above and values as
+        numbers.
+        """
+
+        log.debug("get all")
+
+        values = self.generate([self.now()])[0]
+        return dict(zip(self.all_fields, values.tolist()))
+
+    def start_stream(self, rate):
+        """
+        Starts pushing the get_all values to the stream ring buffer
+
+        arguments:
+        - rate           the number of samples per second
+
+        returns: True
+        """
+
+        log.debug("set stream %s", rate)
+
+        self.stream.clear()
+        self.streaming = True
+        self._stream_interval = 1. / rate
+        self._stream_next = self.now()
+        return True
+
+    def stop_stream(self):
+        """
+        Stops the streaming
+
+        returns: an "OK" string in case of success.
+        """
+
+        log.debug("set stream 0")
+
+        self.streaming = False
+        return "OK"
+
+    def poll_stream(self):
+        """
+        Pushes, in one block, the samples streamed since the previous
+        call to the stream ring buffer.
+        """
+
+        if not self.streaming:
+            return
+
+        count = int((self.now() - self._stream_next) / self._stream_interval) + 1
+        if count <= 0:
+            return
+
+        times = self._stream_next + np.arange(count) * self._stream_interval
+        self._stream_next = times[-1] + self._stream_interval
+        self.stream.extend(times, self.generate(times))
+
+    def get_alarms(self):
+        """
+        Get the alarms from the ESP32
+
+        returns: a ESP32Alarm instance describing the possible alarms.
+        """
+
+        return ESP32Alarm(int(self.get("alarm")))
+
+    def get_warnings(self):
+        """
+        Get the warnings from the ESP32
+
+        returns: a ESP32Warning instance describing the possible warnings.
+        """
+
+        return ESP32Warning(int(self.get("warning")))
+
+    def reset_alarms(self):
+        """
+        Reset all the raised alarms in ESP32
+
+        returns: an "OK" string in case of success.
+        """
+
+        self._log("alarms lowered")
+        return self.set("alarm", 0)
+
+    def reset_warnings(self):
+        """
+        Reset all the raised warnings in ESP32
+
+        returns: an "OK" string in case of success.
+        """
+
+        self._log("warnings lowered")
+        return self.set("warning", 0)
+
+    def raise_gui_alarm(self):
+        """
+        Raises an alarm in ESP32
+
+        returns: an "OK" string in case of success.
+        """
+
+        self._log("GUI Alarm!")
+
+        self.set_params["alarm"] = self.set_params["alarm"] | 1 << 29
+
+        return "OK"
+
+    def snooze_hw_alarm(self, alarm_type):
+        """
+        Function to snooze the corresponding alarm in ESP32
+
+        arguments:
+        - alarm_type      an integer representing the alarm type. One and
+                          only one
+
+        returns: an "OK" string in case of success.
+        """
+
+        self._log("Snooze HW alarm %d" % alarm_type)
+        current_alarm = self.set_params["alarm"]
+        if current_alarm & alarm_type:
+            self.set_params["alarm"] = current_alarm ^ alarm_type
+        return "OK"
+
+    def snooze_gui_alarm(self):
+        """
+        Function to snooze the GUI alarm in ESP32
+
+        returns: an "OK" string in case of success.
+        """
+
+        self._log("Snooze gui alarms")
+        return self.snooze_hw_alarm(1 << 29)
@@ -0,0 +1,61 @@
+"""
+Asynchronous transport for the ESP32 link, for the Qt GUI.
+
+The ESP32Transport is the core Transport, serving every command from a
+dedicated I/O thread so that the Qt main thread never blocks on the serial
+port, with the completed requests sent back to the main thread by means of
+a queued Qt signal and delivered to the callbacks given at submission time.
+"""
+
+from PyQt5 import QtCore
+from core.transport import Transport, ESP32Request
+
+__all__ = ("ESP32Transport", "ESP32Request")
+
+
+class _Relay(QtCore.QObject):
+    """
+    Carries the completed requests from the I/O thread to the main thread
+    """
+
+    done = QtCore.pyqtSignal(object)
+
+
+class ESP32Transport(Transport):
+    """
+    The Transport delivering the completed requests through the Qt event
+    loop: the callbacks and errbacks are called in the main thread without
+    calling process_completed().
+    """
+
+    def __init__(self, esp32, config, threaded=True):
+        """
+        Constructor
+
+        arguments:
+        - esp32          the ESP32Serial instance. From now on it is owned
+                         by the transport and must not be used directly.
+        - config         the configuration dictionary, the polling
+                         intervals are used as default deadlines
+        - threaded       if True, the commands are served by a dedicated
+                         I/O thread. If False, they are executed in the
+                         main thread as soon as they are submitted. In
+                         both cases callbacks are called from the Qt
+                         event loop.
+        """
+
+        # the I/O thread may complete a request as soon as started
+        self._relay = _Relay()
+        self._relay.done.connect(self._dispatch, QtCore.Qt.QueuedConnection)
+
+        super(ESP32Transport, self).__init__(esp32, config, threaded)
+
+    def _deliver(self, request):
+        """
+        Sends a completed request to the main thread
+
+        arguments:
+        - request        the completed ESP32Request
+        """
+
+        self._relay.done.emit(request)
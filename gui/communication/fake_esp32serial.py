@@ -1,26 +1,30 @@
 """
-A dummy class that can be used for testing the GUI when a real
-ESP32 chip isn't available.
+A Qt panel to control the simulated ESP32, for testing the GUI when a
+real ESP32 chip isn't available.
 """
 
-import random
-import time
-from PyQt5 import QtWidgets, uic
+import logging
+from PyQt5 import QtCore, QtWidgets
 from PyQt5.QtGui import QTextCursor
-from communication.peep import peep
-from . import ESP32Alarm, ESP32Warning
+from ui_cache import load_ui
+from .esp32simulator import ESP32Simulator
+
+log = logging.getLogger(__name__)
+
 
 class FakeMonitored(QtWidgets.QWidget):
-    def __init__(self, name, generator, value=0, random=True):
+    def __init__(self, name, simulator, value=0, random=True):
         super(FakeMonitored, self).__init__()
-        uic.loadUi('communication/input_monitor_widget.ui', self)
+        load_ui('communication/input_monitor_widget.ui', self)
 
-        self.generator = generator
+        self.name = name
+        self.simulator = simulator
 
         self.findChild(QtWidgets.QLabel, "label").setText(name)
 
         self.value_ib = self.findChild(QtWidgets.QDoubleSpinBox, "value")
         self.value_ib.setValue(value)
+        self.value_ib.valueChanged.connect(self._update_simulator)
 
         self.random_cb = self.findChild(QtWidgets.QCheckBox, "random_checkbox")
         self.random_cb.setChecked(random)
@@ -29,54 +33,66 @@ class FakeMonitored(QtWidgets.QWidget):
 
     def _random_checkbox_fn(self):
         self.value_ib.setEnabled(not self.random_cb.isChecked())
+        self._update_simulator()
 
-    def generate(self):
+    def _update_simulator(self):
+        '''
+        Fixes the simulated value, unless random
+        '''
         if self.random_cb.isChecked():
-            return self.generator()
+            self.simulator.set_fixed(self.name, None)
         else:
-            return self.value_ib.value()
+            self.simulator.set_fixed(self.name, self.value_ib.value())
 
 class FakeESP32Serial(QtWidgets.QMainWindow):
-    peep = peep()
-    def __init__(self, config):
+    '''
+    The front end of an ESP32Simulator: fixes the values of the
+    observables, raises the ESP alarms and warnings, changes the
+    status, and shows the commands affecting the alarms.
+
+    The ESP32 methods (get_all, set, ...) are those of the
+    simulator, so that this can be used in place of ESP32Serial.
+    They do not touch the widgets, and can be called from any thread.
+    '''
+
+    logged = QtCore.pyqtSignal(str)
+
+    def __init__(self, config, simulator=None):
+        '''
+        Constructor
+
+        arguments:
+        - config: the config dictionary
+        - simulator: the ESP32Simulator to control, a new one if None
+        '''
         super(FakeESP32Serial, self).__init__()
 
-        uic.loadUi('communication/fakeesp32.ui', self)
-        self.get_all_fields = config["get_all_fields"]
-        self.observables = {name: None for name in self.get_all_fields}
+        load_ui('communication/fakeesp32.ui', self)
+        self.simulator = simulator if simulator is not None else ESP32Simulator(config)
+        self.observables = {name: None for name in self.simulator.get_all_fields}
 
         self._arrange_fields()
         self.alarms_checkboxes = {}
         self.warning_checkboxes = {}
         self._connect_alarm_and_warning_widgets()
         self._connect_status_widgets()
-        self._lung_recruit_stop_time = 0
-
-
-        self.set_params = {
-            "run": 0,
-            "mode": 0,
-            "backup": 0,
-            "alarm": 0,
-            "warning": 0,
-            "temperature": 40,
-            "rate": 17.0,
-            "ratio": 2/3,
-            "ptarget": 37.7,
-            "pcv_trigger_enable": 1,
-            "pcv_trigger": 7,
-            "assist_ptrigger": 7.0,
-            "assist_flow_min": 47.0,
-            "pressure_support": 27.,
-            "backup_min_time": 17.0,
-            "backup_enable": 1,
-            "pause_lg_p": 37,
-            "pause_lg_time": 7.0}
 
         self.event_log = self.findChild(QtWidgets.QPlainTextEdit, "event_log")
         self.event_log.setReadOnly(True)
+
+        # the simulator may log from the transport thread
+        self.logged.connect(self.log)
+        self.simulator.log_callback = self.logged.emit
         self.show()
 
+    def __getattr__(self, name):
+        '''
+        The ESP32 methods and attributes are those of the simulator
+        '''
+        if name == 'simulator':
+            raise AttributeError(name)
+        return getattr(self.simulator, name)
+
     def _arrange_fields(self):
         max_colums = 3 # you eventually need to edit the
                        # input_monitor_widget.ui file to put more
@@ -86,36 +102,7 @@ class FakeESP32Serial(QtWidgets.QMainWindow):
         row = 0
         column = 0
         for name in self.observables:
-            if name == "pressure":
-                generator = self.peep.pressure
-            elif name == "flow":
-                generator = self.peep.flow
-            elif name == "battery_charge":
-                generator = lambda: int(random.uniform(0, 100))
-            elif name == "tidal":
-                generator = lambda: random.uniform(1000, 1500)
-            elif name == "peep":
-                generator = lambda: random.uniform(4, 20)
-            elif name == "temperature":
-                generator = lambda: random.uniform(10, 50)
-            elif name == "battery_powered":
-                generator = lambda: int(random.uniform(0, 1.5))
-            elif name == "bpm":
-                generator = lambda: random.uniform(10, 100)
-            elif name == "o2":
-                generator = lambda: random.uniform(10, 100)
-            elif name == "peak":
-                generator = lambda: random.uniform(10, 100)
-            elif name == "total_inspired_volume":
-                generator = lambda: random.uniform(10, 100)
-            elif name == "total_expired_volume":
-                generator = lambda: random.uniform(10, 100)
-            elif name == "volume_minute":
-                generator = lambda: random.uniform(10, 100)
-            else:
-                generator = lambda: random.uniform(10, 100)
-
-            fake_mon = FakeMonitored(name, generator)
+            fake_mon = FakeMonitored(name, self.simulator)
             self.observables[name] = fake_mon
 
             monitors_grid.addWidget(fake_mon, row, column)
@@ -130,14 +117,14 @@ class FakeESP32Serial(QtWidgets.QMainWindow):
         for item in self.alarms_checkboxes:
             if self.alarms_checkboxes[item].isChecked():
                 number += item
-        self.set("alarm", number)
+        self.simulator.set("alarm", number)
 
     def _compute_and_raise_warnings(self):
         number = 0
         for item in self.warning_checkboxes:
             if self.warning_checkboxes[item].isChecked():
                 number += item
-        self.set("warning", number)
+        self.simulator.set("warning", number)
 
     def _connect_alarm_and_warning_widgets(self):
         def get_checkbox(wname, alarm_code):
@@ -195,172 +182,11 @@ class FakeESP32Serial(QtWidgets.QMainWindow):
         '''
         Changes the run,mode,backup variables in the ESP
         '''
-        self.set('run',    int(self.status_run.isChecked()))
-        self.set('mode',   int(self.status_mode.isChecked()))
-        self.set('backup', int(self.status_backup.isChecked()))
+        self.simulator.set('run',    int(self.status_run.isChecked()))
+        self.simulator.set('mode',   int(self.status_mode.isChecked()))
+        self.simulator.set('backup', int(self.status_backup.isChecked()))
 
     def log(self, message):
         self.event_log.appendPlainText(message)
         c = self.event_log.textCursor();
         c.movePosition(QTextCursor.End);
-
-    def set(self, name, value):
-        """
-        Set command wrapper
-
-        arguments:
-        - name           the parameter name as a string
-        - value          the value to assign to the variable as any type
-                         convertible to string
-
-        returns: an "OK" string in case of success.
-        """
-
-        print("FakeESP32Serial-DEBUG: set %s %s" % (name, value))
-
-        if name == 'pause_lg' and int(value) == 1:
-            self._lung_recruit_stop_time = time.time() + self.set_params["pause_lg_time"]
-
-        self.set_params[name] = value
-        return "OK"
-
-    def set_watchdog(self):
-        """
-        Set the watchdog polling command
-
-        returns: an "OK" string in case of success.
-        """
-
-        return self.set("watchdog_reset", 1)
-
-    def get(self, name):
-        """
-        Get command wrapper
-
-        arguments:
-        - name           the parameter name as a string
-
-        returns: the requested value
-        """
-
-        print("FakeESP32Serial-DEBUG: get %s" % name)
-
-        retval = 0
-
-        if name in self.observables:
-            retval = self.observables[name].generate()
-        elif name == 'pause_lg_time':
-            eta = self._lung_recruit_stop_time - time.time()
-            if eta > 0:
-                retval = eta
-            else:
-                retval = 0
-        elif name in self.set_params:
-            retval = self.set_params[name]
-        else:
-            retval = int(random.uniform(10, 100))
-
-        return str(retval)
-
-    def get_all(self):
-        """
-        Get the pressure, flow, o2, and bpm at once and in this order.
-
-        returns: a dict with member keys as written above and values as
-        strings.
-        """
-
-        print("FakeESP32Serial-DEBUG: get all")
-
-        values = [self.get(field) for field in self.get_all_fields]
-
-        return dict(zip(self.get_all_fields, values))
-
-    def get_alarms(self):
-        """
-        Get the alarms from the ESP32
-
-        returns: a ESP32Alarm instance describing the possible alarms.
-        """
-
-        return ESP32Alarm(int(self.get("alarm")))
-
-    def get_warnings(self):
-        """
-        Get the warnings from the ESP32
-
-        returns: a ESP32Warning instance describing the possible warnings.
-        """
-
-        return ESP32Warning(int(self.get("warning")))
-
-    def reset_alarms(self):
-        """
-        Reset all the raised alarms in ESP32
-
-        returns: an "OK" string in case of success.
-        """
-
-        self.log("alarms lowered")
-        return self.set("alarm", 0)
-
-    def reset_warnings(self):
-        """
-        Reset all the raised warnings in ESP32
-
-        returns: an "OK" string in case of success.
-        """
-
-        self.log("warnings lowered")
-        return self.set("warning", 0)
-
-    def raise_gui_alarm(self):
-        """
-        Raises an alarm in ESP32
-
-        arguments:
-        - alarm_type      an integer representing the alarm type
-
-        returns: an "OK" string in case of success.
-        """
-
-        self.log("GUI Alarm!")
-
-        self.set_params["alarm"] = self.set_params["alarm"] | 1 << 29
-
-        return "OK"
-
-    def snooze_hw_alarm(self, alarm_type):
-        """
-        Function to snooze the corresponding alarm in ESP32
-
-        arguments:
-        - alarm_type      an integer representing the alarm type. One and
-                          only one
-
-        returns: an "OK" string in case of success.
-        """
-
-        bitmap = { 1 << x: x for x in range(32)}
-
-        pos = bitmap[alarm_type]
-
-        self.log("Snooze HW alarm %d" % alarm_type)
-        current_alarm = self.set_params["alarm"]
-        if current_alarm & alarm_type:
-            self.set_params["alarm"] = current_alarm ^ alarm_type
-        return "OK"
-
-    def snooze_gui_alarm(self):
-        """
-        Function to snooze the corresponding alarm in ESP32
-
-        arguments:
-        - alarm_type      an integer representing the alarm type. One and
-                          only one
-
-        returns: an "OK" string in case of success.
-        """
-
-        self.log("Snooze gui alarms")
-        return self.snooze_hw_alarm(1 << 29)
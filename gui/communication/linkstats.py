@@ -0,0 +1,185 @@
+"""
+Counters and latency histograms for the ESP32 link
+"""
+
+from collections import Counter, defaultdict
+from threading import Lock
+import json
+
+__all__ = ("LatencyHistogram", "LinkStats")
+
+
+class LatencyHistogram:
+    """
+    A log-linear (HDR-style) histogram of durations.
+
+    The durations are recorded in microseconds, in buckets whose width
+    grows with the value, so that any value is known within about 3%
+    (5 significant bits) with a memory footprint independent of the
+    number of samples.
+    """
+
+    SIGNIFICANT_BITS = 5
+
+    def __init__(self):
+        self.counts = Counter()
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, value):
+        """
+        Returns the lower bound of the bucket holding a value
+
+        arguments:
+        - value          the value in microseconds, as integer
+        """
+
+        shift = max(value.bit_length() - self.SIGNIFICANT_BITS, 0)
+        return (value >> shift) << shift
+
+    def _bucket_top(self, bucket):
+        """
+        Returns the upper bound of a bucket
+
+        arguments:
+        - bucket         the lower bound of the bucket
+        """
+
+        shift = max(bucket.bit_length() - self.SIGNIFICANT_BITS, 0)
+        return bucket + (1 << shift) - 1
+
+    def record(self, seconds):
+        """
+        Records a duration
+
+        arguments:
+        - seconds        the duration in seconds
+        """
+
+        value = int(seconds * 1e6)
+        self.counts[self._bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percent):
+        """
+        Returns the value below which the given percentage of the
+        recorded durations falls
+
+        arguments:
+        - percent        the percentage, between 0 and 100
+
+        returns: the duration in microseconds, or None if empty
+        """
+
+        if not self.count:
+            return None
+
+        threshold = self.count * percent / 100.
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= threshold:
+                return min(self._bucket_top(bucket), self.max)
+        return self.max
+
+    def to_dict(self):
+        """
+        returns: a JSON-convertible summary of the histogram, durations
+                 in microseconds
+        """
+
+        return {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "p99.9": self.percentile(99.9),
+            "buckets": {str(b): n for b, n in sorted(self.counts.items())},
+        }
+
+
+class LinkStats:
+    """
+    The instrumentation of the ESP32 link: per verb latency histograms
+    and counters, bytes transferred, set commands not sent because the
+    value was unchanged and time spent waiting for the link lock.
+    Updated by the I/O thread, it can be read at any time.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.latency = defaultdict(LatencyHistogram)
+        self.lock_wait = LatencyHistogram()
+        self.calls = Counter()
+        self.retries = Counter()
+        self.timeouts = Counter()
+        self.parse_failures = Counter()
+        self.failures = Counter()
+        self.resyncs = 0
+        self.mirror_hits = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def record_call(self, verb, seconds, success):
+        """
+        Records a completed command
+
+        arguments:
+        - verb           the command verb
+        - seconds        the time spent, retries included
+        - success        False if the command failed
+        """
+
+        with self._lock:
+            self.calls[verb] += 1
+            self.latency[verb].record(seconds)
+            if not success:
+                self.failures[verb] += 1
+
+    def record_lock_wait(self, seconds):
+        """
+        Records the time spent waiting for the link lock
+        """
+
+        with self._lock:
+            self.lock_wait.record(seconds)
+
+    def snapshot(self):
+        """
+        returns: a JSON-convertible copy of all the counters
+        """
+
+        with self._lock:
+            return {
+                "calls": dict(self.calls),
+                "retries": dict(self.retries),
+                "timeouts": dict(self.timeouts),
+                "parse_failures": dict(self.parse_failures),
+                "failures": dict(self.failures),
+                "resyncs": self.resyncs,
+                "mirror_hits": self.mirror_hits,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "latency_us": {verb: h.to_dict()
+                               for verb, h in self.latency.items()},
+                "lock_wait_us": self.lock_wait.to_dict(),
+            }
+
+    def dump(self, path):
+        """
+        Writes the counters to a JSON file
+
+        arguments:
+        - path           the file path
+        """
+
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
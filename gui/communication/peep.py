@@ -1,18 +1,128 @@
+import os
 import time
+import logging
+from collections import namedtuple
+from functools import lru_cache
 import numpy as np
-import os
 import yaml
 
 """
 a class to simulate the patient breath
 """
+
+log = logging.getLogger(__name__)
+
+# the number of points of the breath cycle tables
+TABLE_POINTS = 1024
+
+# seconds between two checks of the simulation.yaml modification time
+REFRESH_INTERVAL = 1.
+
+# the parameters of the breath model, with the times t1..t5 since
+# the start of the cycle and the pressures p1, p2 relative to p0
+BreathModel = namedtuple("BreathModel", ("t1", "t2", "t3", "t4", "t5",
+                                         "p0", "p1", "p2",
+                                         "f1", "f2", "f3", "f4",
+                                         "decaytime"))
+
+
+def _evaluate(model, t):
+    """
+    returns the pressure in mbar and the flow in lpm of the model, as
+    arrays, at the times t (an array, in s since the start of the cycle)
+    see the configuration file simulation.yaml for details
+    """
+    m = model
+    tau_p = (m.t3 - m.t2)*m.decaytime
+    tau_f = (m.t2 - m.t1)*m.decaytime
+
+    # the exponentials overflow outside of their branch
+    with np.errstate(over='ignore'):
+        p = m.p0 + np.select(
+            [(t > m.t1) & (t < m.t2),
+             (t >= m.t2) & (t < m.t3),
+             (t >= m.t3) & (t < m.t4),
+             (t >= m.t4) & (t < m.t5)],
+            # pressure linear increase, then exponential decrease
+            # to the intermediate level, stable for a while, and
+            # exponential drop
+            [m.p2/(m.t2-m.t1)*(t - m.t1),
+             m.p1 + (m.p2 - m.p1)*np.exp(-(t-m.t2)/tau_p),
+             m.p1,
+             m.p1*np.exp(-(t-m.t4)/tau_p)],
+            0.)
+        f = np.select(
+            [(t > m.t1) & (t < m.t2),
+             (t >= m.t2) & (t < m.t4)],
+            # flow decays exponentially after a fast grow reaching an
+            # intermediate level, then drops to low values, and
+            # increases exponentially to zero
+            [m.f1 - m.f2*(1-np.exp(-(t-m.t1)/tau_f)),
+             m.f3 - m.f4*np.exp(-(t-m.t2)/tau_f)],
+            m.f3)
+    return p, f
+
+
+@lru_cache(maxsize=16)
+def _breath_table(model, inspiration):
+    """
+    Evaluates one breath cycle of the model, by phase: the inspiration
+    (t1 to t4) is stretched over the 'inspiration' fraction of the
+    cycle, the expiration (t4 to t1 of the next cycle) over the rest.
+
+    returns: a (4, TABLE_POINTS + 1) array with, for each phase step,
+             the pressure, its increase to the next step, the flow and
+             its increase, the last step being the start of the next
+             cycle
+    """
+    phase = np.arange(TABLE_POINTS + 1) / TABLE_POINTS
+    t = np.where(phase < inspiration,
+                 model.t1 + phase / inspiration * (model.t4 - model.t1),
+                 model.t4 + (phase - inspiration) / (1 - inspiration) *
+                 (model.t5 + model.t1 - model.t4))
+    # past t5 the cycle is back to the start
+    t = np.where(t >= model.t5, t - model.t5, t)
+
+    pressure, flow = _evaluate(model, t)
+    table = np.zeros((4, TABLE_POINTS + 1))
+    table[0] = pressure
+    table[1, :-1] = np.diff(pressure)
+    table[2] = flow
+    table[3, :-1] = np.diff(flow)
+    table.setflags(write=False)
+    return table
+
+
 class peep:
-    def __init__(self):
-        base_dir = os.path.dirname(__file__)
-        settings_file = os.path.join(base_dir, 'simulation.yaml')
-        with open(settings_file) as f:
+    """
+    The pressure and flow are looked up, by the phase in the breath
+    cycle, in a table evaluated once per simulation.yaml parameter set
+    and I:E ratio. The cycle follows the simulation.yaml timing, or the
+    respiratory rate and I:E ratio set with set_timing(): a new rate
+    only changes the phase step.
+    """
+
+    def __init__(self, settings_file=None):
+        if settings_file is None:
+            base_dir = os.path.dirname(__file__)
+            settings_file = os.path.join(base_dir, 'simulation.yaml')
+        self.settings_file = settings_file
+        self.rate = None
+        self.ratio = None
+        self._mtime = None
+        self._next_refresh = 0
+        self.load()
+
+    def load(self):
+        """
+        Reads simulation.yaml; the tables are evaluated again
+        only if the parameters changed
+        """
+        self._mtime = os.stat(self.settings_file).st_mtime
+        with open(self.settings_file) as f:
             config = yaml.load(f, Loader=yaml.FullLoader)
-        print ('Simulator Config:', yaml.dump(config), sep='\n')
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('Simulator Config:\n%s', yaml.dump(config))
         self.t1 = float(config['t1'])
         self.t2 = self.t1 + float(config['t2'])
         self.t3 = self.t2 + float(config['t3'])
@@ -27,74 +137,101 @@ class peep:
         self.f4 = float(config['f4'])
         self.decaytime = float(config['decay_time'])
         self.resolution = float(config['resolution'])
-        self.t0 = time.time()
         self.btiming_fluctuations = float(config['btiming_fluctuations'])
-        print('PEEP timing   : {} {} {} {} {}'.format(self.t1, self.t2, self.t3,
-                                                   self.t4, self.t5))
-        print('PEEP pressures: {} {}'.format(self.p1, self.p2))
-        print('PEEP flow     : {} {} {} {}'.format(self.f1, self.f2, self.f3, self.f4))
+        # the scale of the random fluctuations
+        self.pressure_noise = (self.p2 - self.p1)*self.resolution
+        self.flow_noise = (self.f1 - self.f2)*self.resolution
+        log.debug('PEEP timing   : %s %s %s %s %s', self.t1, self.t2, self.t3,
+                  self.t4, self.t5)
+        log.debug('PEEP pressures: %s %s', self.p1, self.p2)
+        log.debug('PEEP flow     : %s %s %s %s', self.f1, self.f2, self.f3, self.f4)
+
+        self.model = BreathModel(self.t1, self.t2, self.t3, self.t4, self.t5,
+                                 self.p0, self.p1, self.p2,
+                                 self.f1, self.f2, self.f3, self.f4,
+                                 self.decaytime)
+        self._set_table()
 
-    def pressure(self):
+    def _set_table(self):
         """
-        returns the inspirarion pressure in mbar
-        see the configuration file simulation.yaml for details
+        Looks up the table of the current model and inspiration
+        fraction, evaluated only the first time
         """
-        t = time.time() - self.t0
-        p = self.p0
-        if t > self.t1 and t < self.t2:
-            # pressure linear increase
-            a = self.p2/(self.t2-self.t1)
-            b = -a*self.t1
-            p += a*t + b
-        elif t >= self.t2 and t < self.t3:
-            # pressure reached its maximum and starts decreasing
-            # exponentially
-            tau = (self.t3 - self.t2)*self.decaytime
-            c = self.p1
-            A = self.p2 - self.p1
-            p += c+A*np.exp(-(t-self.t2)/tau)
-        elif t >= self.t3 and t < self.t4:
-            # pressure stay stable for a while
-            p += self.p1
-        elif t >= self.t4 and t < self.t5:
-            # pressure drops exponentially
-            tau = (self.t3 - self.t2)*self.decaytime
-            A = self.p1
-            p += A*np.exp(-(t-self.t4)/tau)
-        elif t > self.t5:
-            # restart the cycle
-            self.restart()
-        # add some random fluctuations
-        p += np.random.normal(scale = (self.p2 - self.p1)*self.resolution)
-        return p
-
-    def flow(self):
+        self._table = _breath_table(self.model, self.inspiration)
+
+    def refresh(self):
         """
-        returns the flow in lpm
+        Loads simulation.yaml again if it was modified. The
+        modification time is checked every REFRESH_INTERVAL seconds.
+        """
+        now = time.monotonic()
+        if now < self._next_refresh:
+            return
+        self._next_refresh = now + REFRESH_INTERVAL
+        try:
+            if os.stat(self.settings_file).st_mtime != self._mtime:
+                self.load()
+        except (OSError, KeyError, ValueError, yaml.YAMLError) as error:
+            log.error('Cannot reload %s: %s', self.settings_file, error)
+
+    def set_timing(self, rate=None, ratio=None):
+        """
+        Sets the breath cycle timing, as set on the ESP
+
+        arguments:
+        - rate           the breaths per minute, None for the
+                         simulation.yaml timing
+        - ratio          the fraction of the cycle spent in expiration,
+                         E/(I+E) as sent by the GUI, None for the
+                         simulation.yaml timing
+        """
+        if rate is not None and rate <= 0:
+            log.error('Invalid simulated rate %s', rate)
+            return
+        if ratio is not None and not 0 < ratio < 1:
+            log.error('Invalid simulated ratio %s', ratio)
+            return
+        self.rate = rate
+        self.ratio = ratio
+        self._set_table()
+
+    @property
+    def period(self):
         """
-        t = time.time() - self.t0
-        f = self.f3
-        if t > self.t1 and t < self.t2:
-            # flow decays exponentially after a fast grow
-            # reaching an intermediate level
-            tau = (self.t2 - self.t1)*self.decaytime
-            A = self.f1
-            c = self.f2
-            f = A - c*(1-np.exp(-(t-self.t1)/tau))
-        elif t >= self.t2 and t < self.t4:
-            # flow drops to low values, then increase
-            # exponentially to zero
-            tau = (self.t2 - self.t1)*self.decaytime
-            A = self.f3
-            c = self.f4
-            f = A-c*np.exp(-(t-self.t2)/tau)
-        elif t > self.t5:
-            # restart cycle
-            self.restart()
-        # add some random fluctuation
-        f += np.random.normal(scale = (self.f1 - self.f2)*self.resolution)
-        return f
-
-    def restart(self):
-        # the cycle restarts after a fixed +- random time
-        self.t0 = time.time() + np.random.normal(scale = self.btiming_fluctuations)
+        the duration of the breath cycle, in s
+        """
+        if self.rate is None:
+            return self.t5
+        return 60. / self.rate
+
+    @property
+    def inspiration(self):
+        """
+        the fraction of the breath cycle spent in inspiration
+        """
+        if self.ratio is None:
+            return (self.t4 - self.t1) / self.t5
+        return 1. - self.ratio
+
+    def waveform(self, t):
+        """
+        returns the pressure in mbar and the flow in lpm, without the
+        random fluctuations, as arrays, at the times t: an array of
+        times in s since the start of the breath cycle. Outside of the
+        cycle the values are those at the start of the cycle.
+        """
+        # the position in the table, the first and the last
+        # rows are both the start of the cycle
+        x = np.asarray(t, dtype=float) * (TABLE_POINTS / self.period)
+        np.clip(x, 0, TABLE_POINTS, out=x)
+        index = x.astype(np.intp)
+        x -= index
+
+        # np.take on the contiguous rows is much faster than
+        # indexing the table with an array
+        p, dp, f, df = (np.take(row, index) for row in self._table)
+        dp *= x
+        dp += p
+        df *= x
+        df += f
+        return dp, df
@@ -0,0 +1,85 @@
+"""
+Columnar block of samples of the get_all observables
+"""
+
+import numpy as np
+
+__all__ = ("SampleFrame",)
+
+
+class SampleFrame:
+    """
+    A block of timestamped samples: one (samples x fields) float array
+    whose columns are the get_all fields, in a fixed order.
+
+    The consumers work on whole columns or rows at once instead of one
+    value at a time, so the per-sample Python overhead does not grow
+    with the number of observables.
+    """
+
+    def __init__(self, fields, times, values):
+        """
+        Constructor
+
+        arguments:
+        - fields         the sequence of the field names, one per column
+        - times          the array of the sample times, in seconds
+        - values         the (samples x fields) array of the values
+        """
+
+        self.fields = tuple(fields)
+        self.times = np.asarray(times, dtype=float)
+        self.values = np.asarray(values, dtype=float).reshape(
+            len(self.times), len(self.fields))
+        self._columns = {name: i for i, name in enumerate(self.fields)}
+
+    @classmethod
+    def from_dict(cls, fields, values, timestamp):
+        """
+        Builds a single sample frame from a get_all result
+
+        arguments:
+        - fields         the sequence of the field names
+        - values         a dict with the field names as keys and the
+                         values as strings or numbers
+        - timestamp      the sample time, in seconds
+
+        returns: the SampleFrame
+        """
+
+        return cls(fields, [timestamp],
+                   np.array([[values[name] for name in fields]], dtype=float))
+
+    def __len__(self):
+        return len(self.times)
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def column(self, name):
+        """
+        Returns the values of a field for all the samples, as a view
+
+        arguments:
+        - name           the field name
+        """
+
+        return self.values[:, self._columns[name]]
+
+    def last(self):
+        """
+        returns: a dict with the field names as keys and the values of
+                 the newest sample
+        """
+
+        return dict(zip(self.fields, self.values[-1]))
+
+    def scale(self, factors):
+        """
+        Multiplies, in place, each column by a factor
+
+        arguments:
+        - factors        an array with one factor per field
+        """
+
+        self.values *= factors
@@ -0,0 +1,110 @@
+"""
+Thread-safe ring buffer for the samples streamed by the ESP32
+"""
+
+from threading import Lock
+import numpy as np
+from .sampleframe import SampleFrame
+
+__all__ = ("SampleRing",)
+
+
+class SampleRing:
+    """
+    A preallocated ring buffer of timestamped samples.
+
+    The serial reader appends the samples from its own thread, the GUI
+    drains all the samples received since the previous drain. If the GUI
+    does not keep up, the oldest samples are overwritten and counted as
+    dropped.
+    """
+
+    def __init__(self, fields, capacity=4096):
+        """
+        Constructor
+
+        arguments:
+        - fields         the list of the field names of each sample
+        - capacity       the maximum number of samples kept
+        """
+
+        self.fields = list(fields)
+        self.capacity = capacity
+        self.dropped = 0
+
+        self._lock = Lock()
+        self._timestamps = np.zeros(capacity)
+        self._values = np.zeros((capacity, len(self.fields)))
+        self._write = 0
+        self._read = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._write - self._read
+
+    def append(self, timestamp, values):
+        """
+        Appends a sample
+
+        arguments:
+        - timestamp      the sample time, in seconds
+        - values         a sequence of numbers, in the same order as the
+                         fields
+        """
+
+        with self._lock:
+            idx = self._write % self.capacity
+            self._timestamps[idx] = timestamp
+            self._values[idx] = values
+            self._write += 1
+
+            if self._write - self._read > self.capacity:
+                self.dropped += self._write - self._read - self.capacity
+                self._read = self._write - self.capacity
+
+    def extend(self, timestamps, values):
+        """
+        Appends a block of samples at once
+
+        arguments:
+        - timestamps     the array of the sample times, in seconds
+        - values         the (samples x fields) array of the values
+        """
+
+        count = len(timestamps)
+        keep = min(count, self.capacity)
+        timestamps = np.asarray(timestamps, dtype=float)[count - keep:]
+        values = np.asarray(values, dtype=float)[count - keep:]
+
+        with self._lock:
+            idx = (self._write + np.arange(count - keep, count)) % self.capacity
+            self._timestamps[idx] = timestamps
+            self._values[idx] = values
+            self._write += count
+
+            if self._write - self._read > self.capacity:
+                self.dropped += self._write - self._read - self.capacity
+                self._read = self._write - self.capacity
+
+    def drain(self):
+        """
+        Removes all the samples appended since the previous drain
+
+        returns: a SampleFrame with the samples in time order
+        """
+
+        with self._lock:
+            first = self._read % self.capacity
+            count = self._write - self._read
+            self._read = self._write
+
+            idx = (np.arange(count) + first) % self.capacity
+            return SampleFrame(self.fields, self._timestamps[idx], self._values[idx])
+
+    def clear(self):
+        """
+        Discards all the samples
+        """
+
+        with self._lock:
+            self._read = self._write
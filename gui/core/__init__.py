@@ -0,0 +1,13 @@
+"""
+The core of the MVM GUI, without Qt: the transport to the ESP32, the
+acquisition of the samples, their storage and the alarm evaluation.
+
+The core objects publish Events, and the GUI widgets subscribe to them;
+the same objects run headless with 'python -m core'.
+"""
+
+from .events import *
+from .transport import *
+from .storage import *
+from .alarms import *
+from .acquisition import *
@@ -0,0 +1,134 @@
+"""
+Runs the core without the GUI: reads the samples from the ESP32, stores
+them and evaluates the alarms, logging the throughput.
+
+From the gui directory:
+    python -m core [--duration SECONDS] [--settings FILE]
+                   [--simulate [--seed SEED]]
+"""
+
+import argparse
+import logging
+import os.path
+import time
+
+from gui_config import load_config
+from log_handler import setup_logging
+from communication.esp32serial import ESP32Serial
+from communication.esp32simulator import ESP32Simulator
+from . import Transport, Acquisition, SampleStore, AlarmEngine
+
+log = logging.getLogger("core")
+
+# seconds between two throughput reports
+REPORT_INTERVAL = 5
+
+
+def run(config, esp32, duration=None):
+    """
+    Drives the acquisition until interrupted or for the given time
+
+    arguments:
+    - config         the Config
+    - esp32          the Transport
+    - duration       the time to run, in seconds, None to run forever
+    """
+
+    acquisition = Acquisition(config, esp32)
+    store = SampleStore(config)
+    engine = AlarmEngine(config)
+
+    for name in config.all_fields:
+        store.track(name)
+    acquisition.frames.subscribe(store.add_frame)
+    acquisition.frames.subscribe(engine.evaluate)
+    acquisition.sampling_changed.subscribe(store.set_sampling)
+
+    @engine.raised.subscribe
+    def on_raised(alarm, monitor):
+        log.warning("alarm %s raised on %s", alarm, monitor)
+
+    @acquisition.errors.subscribe
+    def on_error(message, stopped):
+        log.error("acquisition error: %s", message)
+        if stopped:
+            acquisition.restart()
+
+    start = time.monotonic()
+    next_tick = next_watchdog = next_report = start
+    last_report = (start, 0, 0)
+
+    while duration is None or time.monotonic() - start < duration:
+        now = time.monotonic()
+        if now >= next_tick:
+            acquisition.tick()
+            next_tick += store.sampling
+        if now >= next_watchdog:
+            esp32.set_watchdog()
+            next_watchdog += config["wdinterval"]
+        if now >= next_report:
+            then, frames, samples = last_report
+            elapsed = max(now - then, 1e-9)
+            log.info("%.1f frames/s, %.1f samples/s, queue depth %d",
+                     (acquisition.frame_count - frames) / elapsed,
+                     (acquisition.sample_count - samples) / elapsed,
+                     esp32.queue_depth())
+            last_report = (now, acquisition.frame_count,
+                           acquisition.sample_count)
+            # nobody clears the alarms here: re-arm them, so that
+            # those still active are logged again in the next report
+            for monitor in engine.latched():
+                engine.clear(monitor)
+            next_report += REPORT_INTERVAL
+
+        wait = min(next_tick, next_watchdog, next_report) - time.monotonic()
+        esp32.process_completed(timeout=max(wait, 0))
+
+    return acquisition
+
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(prog="python -m core",
+                                     description=__doc__.splitlines()[1])
+    parser.add_argument("--settings",
+                        default=os.path.join(base_dir, "default_settings.yaml"),
+                        help="the settings file")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="the time to run, in seconds")
+    parser.add_argument("--simulate", action="store_true",
+                        help="read from the ESP32 simulator")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="the seed of the simulator")
+    args = parser.parse_args()
+
+    config = load_config(args.settings)
+    log_listener, log_ring = setup_logging(config)
+
+    if args.simulate:
+        esp32 = ESP32Simulator(config, seed=args.seed)
+    else:
+        esp32 = ESP32Serial(config)
+    esp32.set("wdenable", 1)
+    transport = Transport(esp32, config)
+
+    try:
+        acquisition = run(config, transport, args.duration)
+        log.info("%d frames, %d samples read",
+                 acquisition.frame_count, acquisition.sample_count)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        transport.stop()
+        esp32.set("wdenable", 0)
+
+        stats_file = config.get("link_stats_file")
+        if stats_file:
+            transport.dump_stats(stats_file)
+
+        log_listener.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Acquisition of the get_all samples from the ESP32
+"""
+
+import time
+import logging
+from communication.sampleframe import SampleFrame
+from .events import Event
+
+__all__ = ("Acquisition",)
+
+log = logging.getLogger(__name__)
+
+
+class Acquisition:
+    """
+    Reads the get_all observables from the ESP32, by polling or from the
+    stream if the ESP32 can stream, converts them and publishes them as
+    SampleFrames.
+
+    The acquisition does not own a clock: tick() is to be called every
+    'sampling_interval' seconds by the thread driving the transport (a
+    QTimer in the GUI). Events:
+    - frames(frame)                 a converted SampleFrame
+    - sampling_changed(interval)    the time between samples changed
+    - errors(message, stopped)      the acquisition failed; if stopped,
+                                    it is paused until restart()
+    """
+
+    def __init__(self, config, esp32):
+        """
+        Constructor
+
+        arguments:
+        - config         the Config
+        - esp32          the transport (Transport or ESP32Transport)
+        """
+
+        self._config = config
+        self._esp32 = esp32
+        self._pending = False
+        self.stopped = False
+
+        self.frames = Event()
+        self.sampling_changed = Event()
+        self.errors = Event()
+
+        # counters, to measure the throughput
+        self.frame_count = 0
+        self.sample_count = 0
+
+        # the columns of the sample frames and the conversion
+        # factor of each one
+        self._fields = list(config.all_fields)
+        self._scale = config.conversion
+
+        # If the ESP can stream, the samples are pushed by the ESP
+        # and tick() only drains them
+        self.streaming = False
+        self._last_sample_time = 0
+        stream_rate = config.get('stream_rate', 0)
+        if stream_rate:
+            self._pending = True
+            self._esp32.start_stream(stream_rate,
+                                     callback=self._on_stream_started,
+                                     errback=self._on_stream_error)
+
+    def tick(self):
+        """
+        Queues a get_all to get the data from the ESP, unless the
+        previous one is still pending, or drains the streamed samples.
+        """
+
+        if self.stopped:
+            return
+
+        if self.streaming:
+            self._drain_stream()
+            return
+
+        if self._pending:
+            return
+
+        self._pending = True
+        self._esp32.get_all(callback=self._on_data,
+                            errback=self._on_error)
+
+    def restart(self):
+        """
+        Resumes the acquisition after an error
+        """
+
+        self.stopped = False
+
+    def _on_stream_started(self, started):
+        """
+        Called when the ESP replied to the stream request.
+        If the ESP cannot stream, keep polling with get_all.
+        """
+
+        self._pending = False
+        self.streaming = started
+        self._last_sample_time = time.monotonic()
+        if started:
+            self.sampling_changed.publish(1. / self._config['stream_rate'])
+        log.info('ESP streaming %s', 'enabled' if started else 'not available')
+
+    def _on_stream_error(self, error):
+        """
+        Called if the stream request failed, keep polling with get_all.
+        """
+
+        self._pending = False
+        self.streaming = False
+        log.error('cannot start the ESP streaming: %s', error)
+
+    def _drain_stream(self):
+        """
+        Processes all the samples streamed since the last call.
+        If the ESP stops streaming, go back to polling with get_all.
+        """
+
+        frame = self._esp32.stream.drain()
+
+        now = time.monotonic()
+        if len(frame) == 0:
+            if now - self._last_sample_time > self._config['stream_timeout']:
+                log.error('no data streamed by the ESP, back to polling')
+                self.streaming = False
+                self._esp32.stop_stream()
+                self.sampling_changed.publish(self._config['sampling_interval'])
+            return
+        self._last_sample_time = now
+
+        self.process_frame(frame)
+
+    def _on_data(self, current_values):
+        """
+        Called with the get_all result.
+        """
+
+        self._pending = False
+
+        try:
+            frame = SampleFrame.from_dict(self._fields, current_values,
+                                          time.monotonic())
+        except Exception as error:
+            self.errors.publish(str(error), False)
+            return
+
+        self.process_frame(frame)
+
+    def process_frame(self, frame):
+        """
+        Converts the values of a SampleFrame and publishes it. An
+        exception raised by a subscriber is published as an error.
+
+        arguments:
+        - frame          the SampleFrame, with the values as read
+        """
+
+        try:
+            frame.scale(self._scale)
+            self.frame_count += 1
+            self.sample_count += len(frame)
+            self.frames.publish(frame)
+        except Exception as error:
+            self.errors.publish(str(error), False)
+
+    def _on_error(self, error):
+        """
+        Called if the get_all failed: the acquisition
+        is stopped until restart()
+        """
+
+        self._pending = False
+        self.stopped = True
+        self.errors.publish(str(error), True)
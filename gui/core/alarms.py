@@ -0,0 +1,253 @@
+"""
+Evaluation of the alarm thresholds on the samples
+"""
+
+from copy import copy
+import numpy as np
+from .events import Event
+
+__all__ = ("AlarmEngine",)
+
+
+class AlarmEngine:
+    """
+    Raises the alarms when the observables go out of their thresholds.
+
+    The thresholds are compiled in a table of arrays, one entry per
+    alarm, evaluated with a few numpy operations per SampleFrame.
+    An alarm becomes active (rising edge) when its observable stays out
+    of the thresholds for 'alarm_debounce' consecutive samples, and
+    inactive again (falling edge) when it stays inside the thresholds,
+    narrowed by the 'alarm_hysteresis' fraction of the min-max range,
+    for as many samples.
+
+    An alarm is latched on its monitor on the rising edge, until
+    cleared by the user. Events:
+    - raised(alarm, monitor)  an alarm latched its monitor
+    - cleared()               the last latched monitor was cleared
+    - thresholds_changed()    a threshold was changed
+    """
+
+    def __init__(self, config):
+        """
+        Constructor
+
+        arguments:
+        - config         the Config, the 'alarms', 'alarm_debounce' and
+                         'alarm_hysteresis' keys are used
+        """
+
+        self._config = config
+        self._obs = copy(config["alarms"])
+
+        self._debounce = max(int(config.get('alarm_debounce', 1)), 1)
+        self._hysteresis = config.get('alarm_hysteresis', 0)
+
+        self._mon_to_obs = config.alarm_by_monitor
+        for n, v in self._obs.items():
+            v['min'] = v.get('min', None)
+            v['max'] = v.get('max', None)
+            v['setmin'] = v.get('setmin', v.get('min'))
+            v['setmax'] = v.get('setmax', v.get('max'))
+
+        self.raised = Event()
+        self.cleared = Event()
+        self.thresholds_changed = Event()
+
+        self._latched = set()
+        self._names = list(self._obs)
+        self._active = np.zeros(len(self._names), dtype=bool)
+        self._table = None
+
+    def alarms(self):
+        """
+        returns: the dicts describing the alarms, by alarm name, with
+                 the 'linked_monitor', 'min', 'max', 'setmin' and
+                 'setmax' keys
+        """
+
+        return self._obs
+
+    def latched(self):
+        """
+        returns: the set of the monitors latched by an alarm
+        """
+
+        return set(self._latched)
+
+    def _compile(self, fields):
+        """
+        Builds the alarm table for the columns of the SampleFrames: for
+        each alarm, the column of its observable and the threshold
+        arrays. The alarms whose observable is not in the frames are
+        never raised.
+        """
+
+        if tuple(fields) == self._config.all_fields:
+            columns = self._config.field_index
+        else:
+            columns = {name: i for i, name in enumerate(fields)}
+
+        def threshold(item, key, default):
+            value = item[key]
+            return default if value is None else value
+
+        items = [self._obs[n] for n in self._names]
+        table = {
+            'fields': tuple(fields),
+            'column': np.array([columns.get(v['observable'], 0) for v in items]),
+            'valid': np.array([v['observable'] in columns for v in items], dtype=bool),
+            'setmin': np.array([threshold(v, 'setmin', -np.inf) for v in items], dtype=float),
+            'setmax': np.array([threshold(v, 'setmax', np.inf) for v in items], dtype=float),
+            'band': np.array([(v['max'] - v['min']) * self._hysteresis
+                              if v['min'] is not None and v['max'] is not None else 0.
+                              for v in items], dtype=float),
+        }
+
+        # the last debounce - 1 samples of the previous frames
+        table['tail'] = np.empty((0, len(items)))
+
+        self._table = table
+
+    def _holds(self, condition):
+        """
+        Checks, for each column of a samples x alarms boolean array, if
+        the condition is True for at least 'alarm_debounce' consecutive
+        samples
+        """
+
+        counts = np.cumsum(np.vstack((np.zeros((1, condition.shape[1]), dtype=int),
+                                      condition)), axis=0)
+        windows = counts[self._debounce:] - counts[:-self._debounce]
+        return (windows == self._debounce).any(axis=0)
+
+    def _find_edges(self, values):
+        """
+        Evaluates the alarms on the values of the observables (a
+        samples x alarms array), preceded by the tail of the previous
+        frames.
+
+        returns: the arrays of the rising and falling edges
+        """
+
+        table = self._table
+        values = np.concatenate((table['tail'], values))
+        table['tail'] = values[max(len(values) - self._debounce + 1, 0):]
+
+        # The active alarms need to go back inside the
+        # hysteresis band to become inactive
+        band = np.where(self._active, table['band'], 0.)
+        outside = (values < table['setmin'] + band) | (values > table['setmax'] - band)
+
+        if len(values) < self._debounce:
+            return np.zeros_like(self._active), np.zeros_like(self._active)
+
+        stays_outside = self._holds(outside)
+        stays_inside = self._holds(~outside)
+
+        rising = ~self._active & stays_outside & table['valid']
+        falling = self._active & stays_inside
+        return rising, falling
+
+    def evaluate(self, frame):
+        """
+        Evaluates the alarms on the samples of a SampleFrame, publishing
+        'raised' for each monitor newly latched
+
+        arguments:
+        - frame          the SampleFrame, with converted values
+        """
+
+        if self._table is None or self._table['fields'] != frame.fields:
+            self._compile(frame.fields)
+
+        rising, falling = self._find_edges(frame.values[:, self._table['column']])
+        self._active |= rising
+        self._active &= ~falling
+
+        for i in np.flatnonzero(rising):
+            name = self._names[i]
+            monitor = self._obs[name]['linked_monitor']
+            if monitor in self._latched:
+                # still shown, not cleared by the user yet
+                continue
+            self._latched.add(monitor)
+            self.raised.publish(name, monitor)
+
+    def clear(self, monitor):
+        """
+        Clears the alarm latched on a monitor, and re-arms it: if the
+        observable is still out of the thresholds, the alarm is raised
+        again. Publishes 'cleared' when no monitor is latched anymore.
+
+        arguments:
+        - monitor        the monitor name
+        """
+
+        if monitor in self._latched:
+            self._latched.remove(monitor)
+            if len(self._latched) == 0:
+                self.cleared.publish()
+
+        obs = self._mon_to_obs.get(monitor, None)
+        if obs is not None:
+            self._active[self._names.index(obs)] = False
+
+    def update_thresholds(self, observable, minimum, maximum):
+        """
+        Updates the thresholds of an alarm
+
+        arguments:
+        - observable     the alarm name
+        - minimum        the new setmin
+        - maximum        the new setmax
+        """
+
+        assert(observable in self._obs)
+
+        self._obs[observable]["setmin"] = minimum
+        self._obs[observable]["setmax"] = maximum
+        self._table = None
+
+    def has_valid_minmax(self, monitor):
+        """
+        Checks if max and min are not None
+        """
+
+        obs = self._mon_to_obs.get(monitor, None)
+        if obs is None: return False
+        value_max = self._obs[obs]['max']
+        value_min = self._obs[obs]['min']
+        return value_max is not None and value_min is not None
+
+    def get(self, monitor, key):
+        """
+        Returns a threshold of the alarm of a monitor
+
+        arguments:
+        - monitor        the monitor name
+        - key            'min', 'max', 'setmin' or 'setmax'
+
+        returns: the value, False if the monitor has no alarm
+        """
+
+        obs = self._mon_to_obs.get(monitor, None)
+        if obs is None: return False
+        return self._obs[obs][key]
+
+    def set(self, monitor, key, value):
+        """
+        Changes the 'setmin' or 'setmax' threshold of the alarm of a
+        monitor, publishing 'thresholds_changed'
+
+        arguments:
+        - monitor        the monitor name
+        - key            'setmin' or 'setmax'
+        - value          the new threshold
+        """
+
+        obs = self._mon_to_obs.get(monitor, None)
+        if obs is not None:
+            self._obs[obs][key] = value
+            self._table = None
+            self.thresholds_changed.publish()
@@ -0,0 +1,51 @@
+"""
+Publish/subscribe for the core objects
+"""
+
+__all__ = ("Event",)
+
+
+class Event:
+    """
+    A list of subscribers called, in subscription order, each time the
+    event is published. The subscribers are called in the thread that
+    publishes: the core objects publish from the thread driving them
+    (the Qt main thread in the GUI).
+    """
+
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """
+        Adds a subscriber
+
+        arguments:
+        - callback       called with the published arguments
+
+        returns: the callback, so that this can be used as a decorator
+        """
+
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        """
+        Removes a subscriber
+
+        arguments:
+        - callback       a function passed to subscribe()
+        """
+
+        self._subscribers.remove(callback)
+
+    def publish(self, *args):
+        """
+        Calls all the subscribers with the given arguments
+        """
+
+        for callback in self._subscribers:
+            callback(*args)
+
+    def __bool__(self):
+        return bool(self._subscribers)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+'''
+Fixed size buffers of floats, used to store the plotted data
+and to track its range.
+'''
+
+from collections import deque
+import numpy as np
+
+
+class RingBuffer():
+    '''
+    A ring buffer with O(1) append and zero-copy views.
+
+    Each value is written twice, at the write index and one size
+    later, so that the samples in time order are always a contiguous
+    slice of the storage. The same storage gives the "looping" view,
+    where the sample i is kept at position i modulo the size.
+
+    Attributes:
+        size    (int) The number of samples kept
+        index   (int) The position the next sample is written to
+    '''
+
+    def __init__(self, size, value=0.):
+        '''
+        Constructor
+
+        arguments:
+        - size: the number of samples kept
+        - value: the initial value of all the samples
+        '''
+        self.size = size
+        self.index = 0
+        self._buffer = np.full(2 * size, value, dtype=float)
+
+    def __len__(self):
+        return self.size
+
+    def append(self, value):
+        '''
+        Adds a sample, overwriting the oldest one
+        '''
+        self._buffer[self.index] = value
+        self._buffer[self.index + self.size] = value
+
+        self.index += 1
+        if self.index == self.size:
+            self.index = 0
+
+    def extend(self, values):
+        '''
+        Adds an array of samples, as append() on each one
+        '''
+        total = len(values)
+        if total > self.size:
+            # only the last 'size' samples are kept
+            self.index = (self.index + total - self.size) % self.size
+            values = values[-self.size:]
+
+        count = len(values)
+        first = min(count, self.size - self.index)
+        rest = count - first
+
+        start = self.index
+        self._buffer[start:start + first] = values[:first]
+        self._buffer[start + self.size:start + self.size + first] = values[:first]
+        self._buffer[:rest] = values[first:]
+        self._buffer[self.size:self.size + rest] = values[first:]
+
+        self.index = (self.index + count) % self.size
+
+    def ordered(self):
+        '''
+        Returns a read-only view of the samples, oldest first
+        '''
+        view = self._buffer[self.index:self.index + self.size]
+        view.flags.writeable = False
+        return view
+
+    def looping(self):
+        '''
+        Returns a read-only view of the samples as stored, the next
+        one to be overwritten being at 'index'
+        '''
+        view = self._buffer[:self.size]
+        view.flags.writeable = False
+        return view
+
+    def last(self):
+        '''
+        Returns the newest sample
+        '''
+        return self._buffer[self.index + self.size - 1]
+
+    def min(self):
+        '''
+        Returns the minimum of the samples
+        '''
+        return self._buffer[:self.size].min()
+
+    def max(self):
+        '''
+        Returns the maximum of the samples
+        '''
+        return self._buffer[:self.size].max()
+
+    def clear(self, value=0.):
+        '''
+        Sets all the samples to value and restarts from position 0
+        '''
+        self.index = 0
+        self._buffer.fill(value)
+
+
+class SlidingExtrema():
+    '''
+    The minimum and maximum of the last 'size' samples, in
+    amortized O(1) per sample.
+
+    Two monotonic deques hold the (index, value) pairs that can
+    still become the minimum or the maximum: a new sample removes
+    from the back all the values it dominates, the samples older
+    than the window are removed from the front.
+
+    Attributes:
+        size    (int) The number of samples in the window
+    '''
+
+    def __init__(self, size, value=0.):
+        '''
+        Constructor
+
+        arguments:
+        - size: the number of samples in the window
+        - value: the initial value of all the samples
+        '''
+        self.size = size
+        self._count = 0
+        # the initial value counts as a sample until the window is full
+        self._min = deque([(-1, value)])
+        self._max = deque([(-1, value)])
+
+    def append(self, value):
+        '''
+        Adds a sample, dropping the oldest one
+        '''
+        index = self._count
+        self._count += 1
+
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((index, value))
+
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((index, value))
+
+        oldest = index - self.size
+        if self._min[0][0] <= oldest:
+            self._min.popleft()
+        if self._max[0][0] <= oldest:
+            self._max.popleft()
+
+    def extend(self, values):
+        '''
+        Adds a sequence of samples
+        '''
+        for value in values:
+            self.append(value)
+
+    def min(self):
+        '''
+        Returns the minimum of the samples in the window
+        '''
+        return self._min[0][1]
+
+    def max(self):
+        '''
+        Returns the maximum of the samples in the window
+        '''
+        return self._max[0][1]
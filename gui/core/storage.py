@@ -0,0 +1,110 @@
+"""
+Storage of the recent samples of the observables
+"""
+
+from .ring_buffer import RingBuffer, SlidingExtrema
+
+__all__ = ("SampleStore",)
+
+
+class SampleStore:
+    """
+    Keeps the last samples of the tracked observables, in RingBuffers of
+    'nsamples' samples, and, for some of them, the extrema of the last
+    'historic_nsamples' samples.
+
+    The number of samples follows the sampling interval, so that the
+    stored time window does not change when the ESP starts or stops
+    streaming.
+    """
+
+    def __init__(self, config):
+        """
+        Constructor
+
+        arguments:
+        - config         the configuration, the 'nsamples',
+                         'historic_nsamples' and 'sampling_interval'
+                         keys are used
+        """
+
+        self.n_samples = config['nsamples']
+        self.n_historic_samples = config.get('historic_nsamples', 200)
+        self.sampling = config['sampling_interval']
+        self.time_window = self.n_samples * self.sampling
+
+        # the RingBuffer of each tracked observable
+        self.data = {}
+        # the SlidingExtrema of the observables with history
+        self.history = {}
+
+    def track(self, name, history=False):
+        """
+        Starts storing the samples of an observable
+
+        arguments:
+        - name           the observable
+        - history        if True, also track the extrema of the
+                         historic samples
+        """
+
+        if name not in self.data:
+            self.data[name] = RingBuffer(self.n_samples)
+        if history and name not in self.history:
+            self.history[name] = SlidingExtrema(self.n_historic_samples)
+
+    def set_sampling(self, sampling):
+        """
+        Changes the time interval between samples. The time window is
+        kept, so the number of samples changes, and the data are reset.
+
+        arguments:
+        - sampling       the new interval, in seconds
+        """
+
+        scale = self.sampling / sampling
+        self.sampling = sampling
+        self.n_samples = int(round(self.n_samples * scale))
+        self.n_historic_samples = int(round(self.n_historic_samples * scale))
+
+        for name in self.data:
+            self.data[name] = RingBuffer(self.n_samples)
+        for name in self.history:
+            self.history[name] = SlidingExtrema(self.n_historic_samples)
+
+    def append(self, name, value):
+        """
+        Stores a sample of an observable, if tracked
+
+        returns: True if the observable is tracked
+        """
+
+        if name in self.history:
+            self.history[name].append(value)
+        if name in self.data:
+            self.data[name].append(value)
+            return True
+        return False
+
+    def add_frame(self, frame):
+        """
+        Stores all the samples of a SampleFrame, one column at a time
+
+        arguments:
+        - frame          the SampleFrame
+
+        returns: the list of the tracked observables updated
+        """
+
+        updated = []
+        for name in frame.fields:
+            if name not in self.data:
+                continue
+
+            column = frame.column(name)
+            if name in self.history:
+                self.history[name].extend(column)
+            self.data[name].extend(column)
+            updated.append(name)
+
+        return updated
@@ -0,0 +1,445 @@
+"""
+Asynchronous transport for the ESP32 link, without Qt.
+
+The Transport owns an ESP32Serial (or compatible) object and serves
+every command from a dedicated I/O thread, so that the thread driving the
+application never blocks on the serial port. The completed requests are
+queued back, and their callbacks are called by process_completed() in the
+driving thread.
+
+Requests are served by priority (watchdog, alarms, waveform, status,
+settings) and, within the same priority, earliest deadline first.
+"""
+
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+
+__all__ = ("Transport", "ESP32Request")
+
+log = logging.getLogger(__name__)
+
+
+class ESP32Request:
+    """
+    A single command queued on the transport.
+    """
+
+    def __init__(self, method, args, callback=None, errback=None,
+                 priority=0, deadline=float("inf")):
+        """
+        Constructor
+
+        arguments:
+        - method         the name of the ESP32Serial method to call
+        - args           a tuple with the positional arguments of the call
+        - callback       a function called in the driving thread with the
+                         result of the call, or None
+        - errback        a function called in the driving thread with the
+                         exception raised by the call, or None
+        - priority       the scheduling priority, lower is served first
+        - deadline       the time.monotonic() value by which the request
+                         should be served
+        """
+
+        self.method = method
+        self.args = args
+        self.callback = callback
+        self.errback = errback
+        self.priority = priority
+        self.deadline = deadline
+        self.result = None
+        self.error = None
+
+    def execute(self, esp32):
+        """
+        Runs the request against the ESP32 object, storing either the
+        result or the exception raised.
+
+        arguments:
+        - esp32          the ESP32Serial instance
+        """
+
+        try:
+            self.result = getattr(esp32, self.method)(*self.args)
+        except Exception as exc:
+            self.error = exc
+
+
+class Transport:
+    """
+    Serves the commands to the ESP32 from a dedicated thread.
+
+    The public methods mirror the ESP32Serial ones, but they never block:
+    each one queues a request and returns immediately. The optional
+    'callback' is called in the driving thread with the value returned by
+    ESP32Serial, the optional 'errback' with the exception raised.
+
+    Each request has a priority (one of the PRIORITY_* constants) and a
+    deadline. The I/O thread always serves the most urgent request first,
+    so that a burst of settings can never delay the watchdog or the alarm
+    polling.
+    """
+
+    PRIORITY_WATCHDOG = 0
+    PRIORITY_ALARMS = 1
+    PRIORITY_WAVEFORM = 2
+    PRIORITY_STATUS = 3
+    PRIORITY_SETTINGS = 4
+
+    PRIORITY_NAMES = {
+        PRIORITY_WATCHDOG: "watchdog",
+        PRIORITY_ALARMS: "alarms",
+        PRIORITY_WAVEFORM: "waveform",
+        PRIORITY_STATUS: "status",
+        PRIORITY_SETTINGS: "settings",
+    }
+
+    def __init__(self, esp32, config, threaded=True):
+        """
+        Constructor
+
+        arguments:
+        - esp32          the ESP32Serial instance. From now on it is owned
+                         by the transport and must not be used directly.
+        - config         the configuration dictionary, the polling
+                         intervals are used as default deadlines
+        - threaded       if True, the commands are served by a dedicated
+                         I/O thread. If False, they are executed in the
+                         calling thread as soon as they are submitted.
+                         In both cases the callbacks are called by
+                         process_completed().
+        """
+
+        self.esp32 = esp32
+        self.threaded = threaded
+
+        # default time, in seconds, allowed to serve a request
+        self.deadlines = {
+            self.PRIORITY_WATCHDOG: config["wdinterval"],
+            self.PRIORITY_ALARMS: config["alarminterval"],
+            self.PRIORITY_WAVEFORM: config["sampling_interval"],
+            self.PRIORITY_STATUS: config["status_sampling_interval"],
+            self.PRIORITY_SETTINGS: float("inf"),
+        }
+
+        # time in seconds between two reads of the streamed frames
+        self.stream_poll_interval = 0.005
+
+        self.served = {p: 0 for p in self.PRIORITY_NAMES}
+        self.deadline_misses = {p: 0 for p in self.PRIORITY_NAMES}
+        self.max_queue_depth = 0
+
+        self._completed = queue.Queue()
+
+        self._seq = itertools.count()
+        self._queue = queue.PriorityQueue()
+        self._thread = None
+        if self.threaded:
+            self._thread = threading.Thread(target=self._serve,
+                                            name="Transport",
+                                            daemon=True)
+            self._thread.start()
+
+    def _serve(self):
+        """
+        The I/O thread main loop: pops the most urgent request from the
+        queue and executes it. A None request stops the loop.
+        While the ESP32 is streaming, the pushed frames are read whenever
+        no request is waiting.
+        """
+
+        while True:
+            if getattr(self.esp32, "streaming", False):
+                try:
+                    item = self._queue.get(timeout=self.stream_poll_interval)
+                except queue.Empty:
+                    self.esp32.poll_stream()
+                    continue
+            else:
+                item = self._queue.get()
+
+            request = item[-1]
+            if request is None:
+                break
+            self._execute(request)
+
+    def _execute(self, request):
+        """
+        Executes a request, updates the counters and sends it back to the
+        driving thread.
+
+        arguments:
+        - request        the ESP32Request to serve
+        """
+
+        if time.monotonic() > request.deadline:
+            self.deadline_misses[request.priority] += 1
+        request.execute(self.esp32)
+        self.served[request.priority] += 1
+        self._deliver(request)
+
+    def _deliver(self, request):
+        """
+        Hands a completed request back to the driving thread
+
+        arguments:
+        - request        the completed ESP32Request
+        """
+
+        self._completed.put(request)
+
+    def process_completed(self, timeout=0):
+        """
+        Calls the callbacks of the completed requests. To be called
+        periodically by the thread driving the application.
+
+        arguments:
+        - timeout        the time in seconds to wait for a completed
+                         request if there is none
+
+        returns: the number of requests dispatched
+        """
+
+        count = 0
+        try:
+            if timeout:
+                request = self._completed.get(timeout=timeout)
+            else:
+                request = self._completed.get_nowait()
+            while True:
+                self._dispatch(request)
+                count += 1
+                request = self._completed.get_nowait()
+        except queue.Empty:
+            return count
+
+    def _dispatch(self, request):
+        """
+        Called in the driving thread when a request is completed. Calls
+        the callback or the errback.
+
+        arguments:
+        - request        the completed ESP32Request
+        """
+
+        if request.error is not None:
+            if request.errback is not None:
+                request.errback(request.error)
+            else:
+                log.error("%s%s failing: %s",
+                          request.method, request.args, request.error)
+        elif request.callback is not None:
+            request.callback(request.result)
+
+    def submit(self, method, *args, callback=None, errback=None,
+               priority=PRIORITY_SETTINGS, timeout=None):
+        """
+        Queues a call to an ESP32Serial method.
+
+        arguments:
+        - method         the name of the ESP32Serial method
+        - args           the arguments to pass to the method
+
+        named arguments:
+        - callback       called in the driving thread with the result
+        - errback        called in the driving thread with the exception
+        - priority       one of the PRIORITY_* constants
+        - timeout        the time in seconds allowed to serve the request,
+                         the default depends on the priority
+
+        returns: the queued ESP32Request
+        """
+
+        if timeout is None:
+            timeout = self.deadlines[priority]
+
+        request = ESP32Request(method, args, callback, errback,
+                               priority, time.monotonic() + timeout)
+
+        if self.threaded:
+            self._queue.put((priority, request.deadline, next(self._seq), request))
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        else:
+            self._execute(request)
+
+        return request
+
+    def queue_depth(self):
+        """
+        returns: the number of requests waiting to be served
+        """
+
+        return self._queue.qsize()
+
+    def stats(self):
+        """
+        Returns the scheduler counters, keyed by priority name.
+
+        returns: a dict with the current and maximum queue depth, the
+                 number of served requests and of deadline misses per
+                 priority, and the link counters of the ESP32 object.
+        """
+
+        return {
+            "queue_depth": self.queue_depth(),
+            "max_queue_depth": self.max_queue_depth,
+            "served": {self.PRIORITY_NAMES[p]: n
+                       for p, n in self.served.items()},
+            "deadline_misses": {self.PRIORITY_NAMES[p]: n
+                                for p, n in self.deadline_misses.items()},
+            "link": getattr(self.esp32, "link_stats", dict)(),
+        }
+
+    def dump_stats(self, path):
+        """
+        Writes the scheduler and link counters to a JSON file
+
+        arguments:
+        - path           the file path
+        """
+
+        with open(path, "w") as f:
+            json.dump(self.stats(), f, indent=2)
+
+    def stop(self):
+        """
+        Stops the I/O thread after the already queued requests are
+        served. After this call the ESP32Serial object can be used
+        directly again.
+        """
+
+        if self._thread is not None:
+            self._queue.put((float("inf"), float("inf"), next(self._seq), None))
+            self._thread.join()
+            self._thread = None
+            self.threaded = False
+
+    def set(self, name, value, callback=None, errback=None,
+            priority=PRIORITY_SETTINGS):
+        """
+        Queues a set command, see ESP32Serial.set
+        """
+
+        return self.submit("set", name, value, callback=callback,
+                           errback=errback, priority=priority)
+
+    def get(self, name, callback=None, errback=None,
+            priority=PRIORITY_STATUS):
+        """
+        Queues a get command, see ESP32Serial.get
+        """
+
+        return self.submit("get", name, callback=callback,
+                           errback=errback, priority=priority)
+
+    def get_many(self, names, callback=None, errback=None,
+                 priority=PRIORITY_STATUS):
+        """
+        Queues a multiple get command, see ESP32Serial.get_many
+        """
+
+        return self.submit("get_many", names, callback=callback,
+                           errback=errback, priority=priority)
+
+    def get_all(self, callback=None, errback=None):
+        """
+        Queues a get all command, see ESP32Serial.get_all
+        """
+
+        return self.submit("get_all", callback=callback, errback=errback,
+                           priority=self.PRIORITY_WAVEFORM)
+
+    @property
+    def stream(self):
+        """
+        The SampleRing collecting the samples streamed by the ESP32
+        """
+
+        if not self.threaded and getattr(self.esp32, "streaming", False):
+            # no I/O thread reads the pushed frames
+            self.esp32.poll_stream()
+        return self.esp32.stream
+
+    def start_stream(self, rate, callback=None, errback=None):
+        """
+        Queues the start of the streaming, see ESP32Serial.start_stream
+        """
+
+        return self.submit("start_stream", rate, callback=callback,
+                           errback=errback, priority=self.PRIORITY_WAVEFORM)
+
+    def stop_stream(self, callback=None, errback=None):
+        """
+        Queues the stop of the streaming, see ESP32Serial.stop_stream
+        """
+
+        return self.submit("stop_stream", callback=callback,
+                           errback=errback, priority=self.PRIORITY_WAVEFORM)
+
+    def set_watchdog(self, callback=None, errback=None):
+        """
+        Queues the watchdog reset, see ESP32Serial.set_watchdog
+        """
+
+        return self.submit("set_watchdog", callback=callback, errback=errback,
+                           priority=self.PRIORITY_WATCHDOG)
+
+    def get_alarms(self, callback=None, errback=None):
+        """
+        Queues the alarms request, see ESP32Serial.get_alarms
+        """
+
+        return self.submit("get_alarms", callback=callback, errback=errback,
+                           priority=self.PRIORITY_ALARMS)
+
+    def get_warnings(self, callback=None, errback=None):
+        """
+        Queues the warnings request, see ESP32Serial.get_warnings
+        """
+
+        return self.submit("get_warnings", callback=callback, errback=errback,
+                           priority=self.PRIORITY_ALARMS)
+
+    def reset_alarms(self, callback=None, errback=None):
+        """
+        Queues the alarms reset, see ESP32Serial.reset_alarms
+        """
+
+        return self.submit("reset_alarms", callback=callback, errback=errback,
+                           priority=self.PRIORITY_ALARMS)
+
+    def reset_warnings(self, callback=None, errback=None):
+        """
+        Queues the warnings reset, see ESP32Serial.reset_warnings
+        """
+
+        return self.submit("reset_warnings", callback=callback, errback=errback,
+                           priority=self.PRIORITY_ALARMS)
+
+    def raise_gui_alarm(self, callback=None, errback=None):
+        """
+        Queues the GUI alarm, see ESP32Serial.raise_gui_alarm
+        """
+
+        return self.submit("raise_gui_alarm", callback=callback, errback=errback,
+                           priority=self.PRIORITY_ALARMS)
+
+    def snooze_hw_alarm(self, alarm_type, callback=None, errback=None):
+        """
+        Queues an alarm snooze, see ESP32Serial.snooze_hw_alarm
+        """
+
+        return self.submit("snooze_hw_alarm", alarm_type, callback=callback,
+                           errback=errback, priority=self.PRIORITY_ALARMS)
+
+    def snooze_gui_alarm(self, callback=None, errback=None):
+        """
+        Queues the GUI alarm snooze, see ESP32Serial.snooze_gui_alarm
+        """
+
+        return self.submit("snooze_gui_alarm", callback=callback, errback=errback,
+                           priority=self.PRIORITY_ALARMS)
@@ -1,8 +1,42 @@
 from PyQt5 import QtGui, QtCore
 import numpy as np
 import pyqtgraph as pg
-from ast import literal_eval # to convert a string to list
-from copy import copy 
+import logging
+from core.storage import SampleStore
+
+log = logging.getLogger(__name__)
+
+
+class PlotRenderState():
+    '''
+    Everything needed to redraw a plot that does not change
+    from one sample to the next: the parsed color, the pen and
+    the x/y buffers handed to pyqtgraph. It is built when the
+    plot is connected and refreshed only if the config or the
+    number of samples change.
+
+    Attributes:
+        color   (tuple) The parsed plot color
+        pen     (QPen) The pen used to draw the data
+        x       (array) The x data, preallocated
+        y       (array) The y data, preallocated
+    '''
+
+    def __init__(self, plot_config, config, xdata):
+        self._plot_config = plot_config
+        self._config = config
+        self.refresh(xdata)
+
+    def refresh(self, xdata):
+        '''
+        Parses the color, builds the pen and
+        allocates the buffers for len(xdata) samples.
+        '''
+        self.color = self._config.color(self._plot_config['color'])
+        self.pen = pg.mkPen(self.color, width=self._config['line_width'])
+        self.x = np.array(xdata)
+        self.y = np.zeros(len(xdata))
+
 
 class DataFiller():
     '''
@@ -11,53 +45,63 @@ class DataFiller():
     updates the plots accordingly.
     It also passes data to the monitors.
 
-    In "frozen" mode, we keep adding new data points to _data,
+    New data points are only stored; the plots and monitors
+    that received new data are redrawn once per render tick
+    (every render_interval seconds), whatever the sampling rate.
+
+    The samples are kept in a core SampleStore.
+
+    In "frozen" mode, we keep adding new data points to the store,
     but don't update the displayed graph. When we unfreeze, we
     then see the full recent data.
 
     Attributes:
         _qtgraphs           (dict) All PlotItems
         _plots              (dict) All PlotDataItems
-        _data               (dict) The data for all plots
-        _historic_data      (dict) The historic data for all plots
+        _store              (SampleStore) The samples of the plots and monitors
         _default_yrange     (dict) The default y ranges per plot
         _yrange             (dict) The current y ranges per plot
+        _autoscaled         (set) The plots whose y range fits the data
         _monitors           (dict) The monitors to which to send data
-        _colors             (dict) The plot color
+        _render_states      (dict) The PlotRenderState per plot
         _config             (dict) The config dict
-        _n_samples          (int) The number of samples to plot
-        _n_historic_samples (int) The number of samples to keep for historic data
-        _sampling           (float) The time interval between samples
         _time_window        (float) The number of seconds shown
         _xdata              (array) The data along x
         _frozen             (bool) True we are in forzen state
         _first_plot         (PlotDataItem) Reference to the first drwan plot
         _looping            (bool) True displays looping plots
-        _looping_data_idx   (int) The x index of the looping line
         _looping_lines      (dict) A dict of InfiniteLines
+        _dirty              (set) The names with data not drawn yet
+        _render_timer       (QTimer) The render tick timer
     '''
 
-    def __init__(self, config):
+    def __init__(self, config, store=None):
+        '''
+        Constructor
+
+        arguments:
+        - config: the config dictionary
+        - store: the SampleStore to fill, a new one if None
+        '''
         self._qtgraphs = {}
         self._plots = {}
-        self._data = {}
-        self._historic_data = {}
         self._default_yrange = {}
         self._yrange = {}
+        self._autoscaled = set()
         self._monitors = {}
-        self._colors = {}
+        self._render_states = {}
         self._config = config
-        self._n_samples = self._config['nsamples']
-        self._n_historic_samples = self._config.get('historic_nsamples',
-                200)
-        self._sampling = self._config['sampling_interval']
-        self._time_window = self._n_samples * self._sampling # seconds
-        self._xdata = np.linspace(-self._time_window, 0, self._n_samples)
+        self._store = store if store is not None else SampleStore(config)
+        self._time_window = self._store.time_window # seconds
+        self._xdata = np.linspace(-self._time_window, 0, self._store.n_samples)
         self._frozen = False
         self._first_plot = None
         self._looping = self._config['use_looping_plots']
-        self._looping_data_idx = {}
         self._looping_lines = {}
+        self._dirty = set()
+        self._render_timer = QtCore.QTimer()
+        self._render_timer.timeout.connect(self.render)
+        self._render_timer.start(int(self._config.get('render_interval', 0.033) * 1000))
         return
 
     def connect_plot(self, plotname, plot):
@@ -76,12 +120,11 @@ class DataFiller():
 
         self._qtgraphs[name] = plot
         self._plots[name] = plot.plot()
-        self._data[name] = np.linspace(0, 0, self._n_samples)
-        self._historic_data[name] = np.linspace(0, 0, self._n_historic_samples)
+        self._store.track(name, history=True)
         self._yrange[name] = None
-        self._plots[name].setData(copy(self._xdata), copy(self._data[name]))
-        self._colors[name] = plot_config['color']
-        self._looping_data_idx[name] = 0
+        self._render_states[name] = PlotRenderState(plot_config, self._config, self._xdata)
+        self._plots[name].setPen(self._render_states[name].pen)
+        self._plots[name].setData(self._render_states[name].x, self._render_states[name].y)
 
         # Set the Y axis
         y_axis_label = plot_config['name']
@@ -99,7 +142,7 @@ class DataFiller():
             plot.getAxis('bottom').setStyle(tickTextOffset=0, tickTextHeight=0)
 
         # Customize the axis color
-        color = self.parse_color(self._config['axis_line_color'])
+        color = self._config.color(self._config['axis_line_color'])
         plot.getAxis('bottom').setPen(pg.mkPen(color, width=self._config['axis_line_width']))
         plot.getAxis('left').setPen(pg.mkPen(color, width=self._config['axis_line_width']))
 
@@ -121,7 +164,21 @@ class DataFiller():
         plot.setMouseEnabled(x=False, y=False)
         plot.setMenuEnabled(False)
 
-        print('NORMAL: Connected plot', plot_config['name'], 'with variable', name)
+        log.info('Connected plot %s with variable %s', plot_config['name'], name)
+
+    def set_sampling(self, sampling):
+        '''
+        Changes the time interval between samples, e.g. when the
+        ESP starts streaming. The displayed time window is kept,
+        so the number of samples changes, and the data are reset.
+        '''
+        self._store.set_sampling(sampling)
+        self._xdata = np.linspace(-self._time_window, 0, self._store.n_samples)
+
+        for name in self._plots:
+            self._render_states[name].refresh(self._xdata)
+            self._autoscaled.discard(name)
+            self.update_plot(name)
 
     def set_default_y_range(self, name):
         '''
@@ -133,6 +190,7 @@ class DataFiller():
 
         # Save the range for future use
         self._yrange[name] = (self._default_yrange[name][0], self._default_yrange[name][1])
+        self._autoscaled.discard(name)
 
         # Set the range to the graph
         self._qtgraphs[name].setYRange(*self._default_yrange[name])
@@ -144,16 +202,27 @@ class DataFiller():
         '''
         Set the Y axis range of the plot to the max and min
         from the historic data set.
+        The range is first fitted to the data, then changed only
+        if the data leave it, or if they fill less than the
+        'autoscale_shrink' fraction of it, so that the axis is not
+        laid out again at each redraw.
         '''
-        if name not in self._historic_data or name not in self._qtgraphs:
+        if name not in self._store.history or name not in self._qtgraphs:
             raise Exception('Cannot set y range for graph', name, 'as it doesn\'t exist.')
 
-        # Calculate the max and min using the larger historical data sample
-        ymax = np.max(self._historic_data[name])
-        ymin = np.min(self._historic_data[name])
+        # The max and min of the larger historical data sample
+        ymax = self._store.history[name].max()
+        ymin = self._store.history[name].min()
 
         if ymax == ymin:
             return
+
+        if name in self._autoscaled:
+            current_min, current_max = self._yrange[name]
+            inside = current_min <= ymin and ymax <= current_max
+            shrink = self._config.get('autoscale_shrink', 0.5)
+            if inside and ymax - ymin >= (current_max - current_min) * shrink:
+                return
         span = ymax - ymin
 
         ymax += span * 0.1
@@ -161,6 +230,7 @@ class DataFiller():
 
         # Save the range for future use
         self._yrange[name] = (ymin, ymax)
+        self._autoscaled.add(name)
 
         # Set the range to the graph
         self._qtgraphs[name].setYRange(*self._yrange[name])
@@ -211,6 +281,8 @@ class DataFiller():
         '''
         Set the X axis range of the plot to the defaults
         specified in the config file.
+        The range does not change with the data, it is set
+        when the plot is connected and when the zoom is reset.
         '''
         self._qtgraphs[name].setXRange(-self._time_window, 0)
 
@@ -259,15 +331,9 @@ class DataFiller():
         name = monitor.observable
         self._monitors[name] = monitor
 
-        self._data[name] = np.linspace(0, 0, self._n_samples)
-
-        self._looping_data_idx[name] = 0
-
+        self._store.track(name)
 
-        if name not in self._data:
-            self._data[name] = np.linspace(0, 0, self._n_samples)
-
-        print('NORMAL: Connected monitor', monitor.configname , 'with variable', name)
+        log.info('Connected monitor %s with variable %s', monitor.configname, name)
 
     def add_data_point(self, name, data_point):
         '''
@@ -275,54 +341,57 @@ class DataFiller():
         name 'name'
         '''
 
-        # print('NORMAL: Received data for monitor', name)
-
-        if name in self._historic_data:
-            # Save to the historic data dict
-            self._historic_data[name][:-1] = self._historic_data[name][1:]
-            self._historic_data[name][-1] = data_point
+        # Looping and scrolling plots share the same buffer,
+        # only the view passed to the plot differs
+        if self._store.append(name, data_point):
+            self._dirty.add(name)
 
-        if name in self._data:
-            if self._looping:
-                # Looping plots - update next value
-                self._data[name][self._looping_data_idx[name]] = data_point
-
-                self._looping_data_idx[name] += 1
+    def add_frame(self, frame):
+        '''
+        Adds all the samples of a SampleFrame,
+        one column at a time
+        '''
+        self._dirty.update(self._store.add_frame(frame))
 
-                if self._looping_data_idx[name] == self._n_samples:
-                    self._looping_data_idx[name] = 0
-            else:
-                # Scrolling plots - shift data 1 sample left
-                self._data[name][:-1] = self._data[name][1:]
+    def render(self):
+        '''
+        Redraws, once, the plots and monitors
+        that received data since the last call.
+        '''
+        dirty = self._dirty
+        self._dirty = set()
 
-                # add the last data point
-                self._data[name][-1] = data_point
+        for name in dirty:
+            if name in self._plots:
+                self.update_plot(name)
 
-        if name in self._plots:
-            self.update_plot(name)
+            if name in self._monitors:
+                self.update_monitor(name)
 
-        if name in self._monitors:
-            self.update_monitor(name)
+    def _plot_data(self, name):
+        '''
+        Returns the view of the data for the plot 'name',
+        as stored in looping mode and oldest first in scrolling mode.
+        '''
+        if self._looping:
+            return self._store.data[name].looping()
+        return self._store.data[name].ordered()
 
     def update_plot(self, name):
         '''
-        Send new data from self._data to the actual pyqtgraph plot.
+        Send new data from the store to the actual pyqtgraph plot.
         '''
 
         if not self._frozen:
             # Update the displayed plot with current data.
             # In frozen mode, we don't update the display.
-            color = self._colors[name]
-            color = color.replace('rgb', '')
-            color = literal_eval(color)
-            self._plots[name].setData(copy(self._xdata),
-                                      copy(self._data[name]),
-                                      pen=pg.mkPen(color, width=self._config['line_width']))
-            self.set_default_x_range(name)
+            state = self._render_states[name]
+            np.copyto(state.y, self._plot_data(name))
+            self._plots[name].setData(state.x, state.y)
             self.set_y_range(name)
 
             if self._looping:
-                x_val = self._xdata[self._looping_data_idx[name]] - self._sampling * 0.1
+                x_val = self._xdata[self._store.data[name].index] - self._store.sampling * 0.1
                 self._looping_lines[name].setValue(x_val)
 
 
@@ -369,14 +438,6 @@ class DataFiller():
         '''
 
         if name in self._monitors:
-            last_data_idx = self._looping_data_idx[name] - 1 if self._looping else -1
-            self._monitors[name].update_value(self._data[name][last_data_idx])
+            self._monitors[name].update_value(self._store.data[name].last())
         else:
             return
-
-    def parse_color(self, rgb_string):
-
-        color = rgb_string.replace('rgb', '')
-        return literal_eval(color)
-
-
@@ -1,16 +1,23 @@
 #!/usr/bin/env python3
 import sys
-import datetime
+import logging
 from PyQt5.QtCore import QTimer
 from messagebox import MessageBox
+from communication.esp32transport import ESP32Transport
+from core.acquisition import Acquisition
+
+log = logging.getLogger(__name__)
+
 
 class DataHandler():
     '''
     This class takes care of starting a new QTimer which
-    is entirey dedicated to read data from the ESP32.
+    drives the core Acquisition, reading data from the ESP32,
+    and passes the acquired SampleFrames to the GUI.
     '''
 
-    def __init__(self, config, esp32, data_filler, gui_alarm):
+    def __init__(self, config, esp32, data_filler, gui_alarm, alarm_h=None,
+                 acquisition=None):
         '''
         Initializes this class by creating a new QTimer
 
@@ -19,12 +26,24 @@ class DataHandler():
         - esp32: the esp32serial instance
         - data_filler: the instance to the DataFiller class 
         - gui_alarm: the alarm class
+        - alarm_h: the AlarmHandler, which receives the alarm and
+                   warning words if they come with the get_all
+        - acquisition: the core Acquisition to drive, a new one if None
         '''
 
         self._config = config
         self._esp32 = esp32
         self._data_f = data_filler
         self._gui_alarm = gui_alarm
+        self._alarm_h = alarm_h
+        self._words = self._config.get('get_all_words', [])
+
+        if acquisition is None:
+            acquisition = Acquisition(config, esp32)
+        self._acquisition = acquisition
+        self._acquisition.frames.subscribe(self._on_frame)
+        self._acquisition.sampling_changed.subscribe(self._data_f.set_sampling)
+        self._acquisition.errors.subscribe(self._on_acquisition_error)
 
         self._timer = QTimer()
         self._timer.timeout.connect(self.esp32_io)
@@ -43,40 +62,35 @@ class DataHandler():
     def esp32_io(self):
         '''
         This is the main function that runs every time a QTimer times out.
-        It runs the get_all to get the data from the ESP.
+        It lets the Acquisition queue a get_all, or drain the stream.
         '''
 
-        try:
-            # Get all params from ESP
-            current_values = self._esp32.get_all()
-
-            # Converting from str to float
-            for p, v in current_values.items():
-                current_values[p] = float(v)
+        self._acquisition.tick()
 
-            current_values = self._convert_values(current_values)
-
-            self._gui_alarm.set_data(current_values)
+    def _on_frame(self, frame):
+        '''
+        Called with each converted SampleFrame, passes
+        it to the alarms and to the DataFiller.
+        '''
 
-            # finally, send values to the DataFiller
-            for p, v in current_values.items():
+        self._gui_alarm.set_frame(frame)
 
-                # print('Got data at time', datetime.datetime.now(), '=>', parameter, data)
-                self._data_f.add_data_point(p, v)
+        # the ESP alarms and warnings are latched,
+        # the newest sample is enough
+        if self._words and self._alarm_h is not None:
+            self._alarm_h.set_words(frame.last())
 
-        except Exception as error:
-            self.open_comm_error(str(error))
+        # finally, send values to the DataFiller
+        self._data_f.add_frame(frame)
 
-    def _convert_values(self, values):
+    def _on_acquisition_error(self, message, stopped):
         '''
+        Called if the acquisition failed.
         '''
 
-        conv = self._config['conversions']
-        return {k:v * conv.get(k, 1.) for (k, v) in values.items()}
-        # for n, v in values.items():
-        #     values[n] = v * conv['pressure'] if 'pressure' in conv else v
-
-
+        if stopped:
+            self._stop_timer()
+        self.open_comm_error(message)
 
     def open_comm_error(self, error):
         '''
@@ -116,14 +130,26 @@ class DataHandler():
         if self._timer.isActive():
             self._stop_timer()
 
+        self._acquisition.restart()
         self._start_timer()
 
-    def set_data(self, param, value):
+    def set_data(self, param, value, callback=None, errback=None,
+                 priority=ESP32Transport.PRIORITY_SETTINGS):
         '''
         Sets data to the ESP
-        '''
 
-        result = self._esp32.set(param, value)
+        arguments:
+        - param: the ESP parameter name
+        - value: the value to set
+        - callback: called with True if the ESP replied with the
+                    success code, False otherwise
+        - errback: called with the exception if the communication failed
+        - priority: the transport priority of the command
+        '''
 
-        return result == self._config['return_success_code']
+        def on_result(result):
+            if callback is not None:
+                callback(result == self._config['return_success_code'])
 
+        self._esp32.set(param, value, callback=on_result, errback=errback,
+                        priority=priority)
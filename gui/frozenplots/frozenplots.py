@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
-from PyQt5 import QtWidgets, uic
+from PyQt5 import QtWidgets
 from PyQt5 import QtGui, QtCore
+from ui_cache import load_ui
 from pyqtgraph import InfiniteLine, TextItem, SignalProxy, PlotDataItem
 import numpy as np
 
@@ -21,13 +22,14 @@ class Cursor:
         self.plots = plots
 
 
-        self.cursor_x = [None] * 3
-        self.cursor_y = [None] * 3
-        self.cursor_label = [None] * 3 
-        self.signal_proxy = [None] * 3
-        self.plot_data_items = [None] * 3
-        self._x = [None] * 3
-        self._y = [None] * 3
+        n_plots = len(plots)
+        self.cursor_x = [None] * n_plots
+        self.cursor_y = [None] * n_plots
+        self.cursor_label = [None] * n_plots
+        self.signal_proxy = [None] * n_plots
+        self.plot_data_items = [None] * n_plots
+        self._x = [None] * n_plots
+        self._y = [None] * n_plots
 
         for num, plot in enumerate(plots):
             self.cursor_x[num] = InfiniteLine(angle=90, movable=False)
@@ -120,7 +122,7 @@ class FrozenPlotsBottomMenu(QtWidgets.QWidget):
         Grabs child widgets.
         """
         super(FrozenPlotsBottomMenu, self).__init__(*args)
-        uic.loadUi("frozenplots/frozenplots_bottom.ui", self)
+        load_ui("frozenplots/frozenplots_bottom.ui", self)
 
         self.button_reset_zoom = self.findChild(QtWidgets.QPushButton, "button_reset_zoom")
         self.xzoom = self.findChild(QtWidgets.QWidget, "xzoom")
@@ -169,7 +171,7 @@ class FrozenPlotsRightMenu(QtWidgets.QWidget):
         Grabs child widgets.
         """
         super(FrozenPlotsRightMenu, self).__init__(*args)
-        uic.loadUi("frozenplots/frozenplots_right.ui", self)
+        load_ui("frozenplots/frozenplots_right.ui", self)
 
         self.yzoom_top = self.findChild(QtWidgets.QWidget, "yzoom_top")
         self.yzoom_mid = self.findChild(QtWidgets.QWidget, "yzoom_mid")
@@ -178,11 +180,10 @@ class FrozenPlotsRightMenu(QtWidgets.QWidget):
     def connect_workers(self, plots, cursor):
         '''
         Connect Y zoom workers. There are 3 widgets, each controlling
-        a separate plot.
+        a separate plot, if configured.
         '''
-        self.yzoom_top.connect_workers(plots[0].getPlotItem(), cursor)
-        self.yzoom_mid.connect_workers(plots[1].getPlotItem(), cursor)
-        self.yzoom_bot.connect_workers(plots[2].getPlotItem(), cursor)
+        for yzoom, plot in zip((self.yzoom_top, self.yzoom_mid, self.yzoom_bot), plots):
+            yzoom.connect_workers(plot.getPlotItem(), cursor)
 
         self._cursor = cursor
 
@@ -199,7 +200,7 @@ class YZoom(QtWidgets.QWidget):
         Grabs child widgets.
         """
         super(YZoom, self).__init__(*args)
-        uic.loadUi("frozenplots/y_zoom.ui", self)
+        load_ui("frozenplots/y_zoom.ui", self)
 
         self.button_plus = self.findChild(QtWidgets.QPushButton, "y_plus")
         self.button_minus = self.findChild(QtWidgets.QPushButton, "y_minus")
@@ -255,7 +256,7 @@ class XZoom(QtWidgets.QWidget):
         Grabs child widgets.
         """
         super(XZoom, self).__init__(*args)
-        uic.loadUi("frozenplots/x_zoom.ui", self)
+        load_ui("frozenplots/x_zoom.ui", self)
 
         self.button_plus = self.findChild(QtWidgets.QPushButton, "x_plus")
         self.button_minus = self.findChild(QtWidgets.QPushButton, "x_minus")
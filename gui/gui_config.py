@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+'''
+Loads and validates the GUI configuration (default_settings.yaml).
+
+The configuration is read as before, as a dictionary, e.g.
+config['nsamples'], and also holds the tables that the code derives
+from it, computed once at load time: the columns of the get_all
+fields, the conversion factors as an array, the plot colors as
+tuples, the alarms by monitor and by observable.
+
+Parsing the YAML file is the slow part, so the validated configuration
+is stored in __pycache__, next to the YAML file, and reused while the
+file modification time, size and content hash are unchanged.
+'''
+
+import os
+import sys
+import pickle
+import hashlib
+import logging
+from ast import literal_eval
+import numpy as np
+import yaml
+
+log = logging.getLogger(__name__)
+
+# Bump when the derived tables change, to invalidate the cached files
+CACHE_VERSION = 2
+
+# The YAML loader, with the C parser if available
+Loader = getattr(yaml, 'CFullLoader', yaml.FullLoader)
+
+
+class ConfigError(ValueError):
+    '''
+    Raised when the configuration is not valid
+    '''
+
+
+def parse_color(rgb_string):
+    '''
+    Converts a "rgb(r,g,b)" string into the (r, g, b) tuple
+    '''
+    return literal_eval(rgb_string.replace('rgb', ''))
+
+
+class Config(dict):
+    '''
+    The configuration dictionary, plus the derived tables.
+
+    Attributes:
+        all_fields       (tuple) The get_all_fields followed by the
+                         get_all_words, the columns of the samples
+        field_index      (dict) The column of each of all_fields
+        conversion       (array) The conversion factor of each column
+        esp_params       (dict) The ESP name of each settable parameter
+        param_conversion (dict) The conversion factor of each settable
+                         parameter, sent to the ESP
+        colors           (dict) The (r, g, b) tuple of each "rgb(...)"
+                         plot and axis color string
+        alarm_by_monitor (dict) The alarm linked to each monitor
+    '''
+
+    REQUIRED = ('port', 'get_all_fields', 'conversions', 'esp_settable_param',
+                'monitors', 'alarms', 'plots', 'axis_line_color',
+                'nsamples', 'sampling_interval')
+
+    def __init__(self, values):
+        '''
+        Constructor
+
+        arguments:
+        - values: the configuration dictionary, as read from the YAML
+
+        raises: ConfigError if the configuration is not valid
+        '''
+        super(Config, self).__init__(values)
+        self._validate()
+        self._derive()
+
+    def _validate(self):
+        '''
+        Checks the keys and references the code relies on,
+        reporting all the problems at once
+        '''
+        errors = ['missing key %s' % key
+                  for key in self.REQUIRED if key not in self]
+        if errors:
+            raise ConfigError('Invalid configuration: ' + ', '.join(errors))
+
+        fields = set(self['get_all_fields']) | set(self.get('get_all_words', []))
+
+        for name in self['conversions']:
+            if name not in fields:
+                errors.append('conversion of unknown field %s' % name)
+
+        for param in self['esp_settable_param']:
+            if param not in self:
+                errors.append('settable parameter %s has no settings' % param)
+
+        for name, plot in self['plots'].items():
+            if plot.get('observable') not in fields:
+                errors.append('plot %s observable %s is not a get_all field' %
+                              (name, plot.get('observable')))
+            if not plot.get('color', '').startswith('rgb('):
+                errors.append('plot %s color is not "rgb(r,g,b)"' % name)
+
+        for name, alarm in self['alarms'].items():
+            if alarm.get('linked_monitor') not in self['monitors']:
+                errors.append('alarm %s is linked to unknown monitor %s' %
+                              (name, alarm.get('linked_monitor')))
+            if alarm.get('observable') not in fields:
+                errors.append('alarm %s observable %s is not a get_all field' %
+                              (name, alarm.get('observable')))
+
+        if errors:
+            raise ConfigError('Invalid configuration: ' + ', '.join(errors))
+
+    def _derive(self):
+        '''
+        Computes the derived tables
+        '''
+        self.all_fields = tuple(self['get_all_fields']) + \
+            tuple(self.get('get_all_words', []))
+        self.field_index = {name: i for i, name in enumerate(self.all_fields)}
+        conversions = self['conversions']
+        self.conversion = np.array([conversions.get(name, 1.)
+                                    for name in self.all_fields])
+
+        self.esp_params = dict(self['esp_settable_param'])
+        self.param_conversion = {param: self[param].get('conversion', 1.)
+                                 for param in self.esp_params}
+
+        strings = [plot['color'] for plot in self['plots'].values()]
+        strings.append(self['axis_line_color'])
+        self.colors = {string: parse_color(string) for string in strings}
+
+        self.alarm_by_monitor = {alarm['linked_monitor']: name
+                                 for name, alarm in self['alarms'].items()}
+
+    def color(self, rgb_string):
+        '''
+        Returns the (r, g, b) tuple of a "rgb(r,g,b)" string
+        '''
+        color = self.colors.get(rgb_string)
+        if color is None:
+            color = self.colors[rgb_string] = parse_color(rgb_string)
+        return color
+
+
+def _cache_path(path):
+    '''
+    Returns the path of the cached configuration of a YAML file
+    '''
+    directory, name = os.path.split(path)
+    name = '%s.%s.pickle' % (name, sys.implementation.cache_tag)
+    return os.path.join(directory, '__pycache__', name)
+
+
+def load_config(path):
+    '''
+    Returns the Config of a YAML file, from the cache if up to date
+
+    arguments:
+    - path: the YAML file path
+
+    raises: ConfigError if the configuration is not valid
+    '''
+    with open(path, 'rb') as f:
+        content = f.read()
+    stat = os.stat(path)
+    signature = (CACHE_VERSION, stat.st_mtime_ns, stat.st_size,
+                 hashlib.sha1(content).hexdigest())
+
+    cache = _cache_path(path)
+    try:
+        with open(cache, 'rb') as f:
+            cached_signature, config = pickle.load(f)
+        if cached_signature == signature:
+            return config
+    except Exception:
+        # missing, out of date or unreadable: parse the YAML
+        pass
+
+    log.debug('Parsing %s', path)
+    config = Config(yaml.load(content, Loader=Loader))
+
+    temporary = '%s.%d' % (cache, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        with open(temporary, 'wb') as f:
+            pickle.dump((signature, config), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, cache)
+    except OSError as error:
+        log.debug('Cannot store the parsed %s: %s', path, error)
+
+    return config
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+'''
+Sets up the logging of the GUI.
+
+Every module logs through the standard logging package, e.g.
+
+```
+import logging
+log = logging.getLogger(__name__)
+
+log.debug("get %s", name)
+```
+
+The level check is done before formatting, so disabled records cost a
+single method call. The enabled records are queued and written by a
+background thread, so that the GUI and the ESP32 I/O thread never wait
+for the terminal or the disk. The most recent records are also kept in
+memory.
+'''
+
+import sys
+import queue
+import logging
+import logging.handlers
+from collections import deque
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+
+class RingHandler(logging.Handler):
+    '''
+    A logging handler keeping the most recent records in memory.
+    '''
+
+    def __init__(self, capacity):
+        '''
+        Constructor
+
+        arguments:
+        - capacity: the maximum number of records kept
+        '''
+
+        super(RingHandler, self).__init__()
+        self._records = deque(maxlen=capacity)
+
+    def emit(self, record):
+        '''
+        Stores a record, dropping the oldest one if full
+        '''
+
+        self._records.append(record)
+
+    def records(self):
+        '''
+        Returns the stored records, oldest first
+        '''
+
+        return list(self._records)
+
+    def lines(self):
+        '''
+        Returns the stored records formatted as strings, oldest first
+        '''
+
+        formatter = self.formatter or logging.Formatter(LOG_FORMAT)
+        return [formatter.format(record) for record in self.records()]
+
+
+def setup_logging(config):
+    '''
+    Configures the root logger from the config
+
+    arguments:
+    - config: the config dictionary, the 'log_level', 'log_file' and
+              'log_ring_size' keys are used
+
+    returns: the started QueueListener (to be stopped on exit, to flush
+             the pending records) and the RingHandler
+    '''
+
+    path = config.get('log_file')
+    if path:
+        output = logging.FileHandler(path)
+    else:
+        output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    records = queue.Queue()
+    listener = logging.handlers.QueueListener(records, output)
+
+    ring = RingHandler(config.get('log_ring_size', 1000))
+
+    root = logging.getLogger()
+    root.setLevel(config.get('log_level', 'INFO'))
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.addHandler(ring)
+
+    listener.start()
+    return listener, ring
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
-from PyQt5 import QtWidgets, uic
+from PyQt5 import QtWidgets
 from PyQt5 import QtGui
+from ui_cache import load_ui
 
 class MainDisplay(QtWidgets.QWidget):
     def __init__(self, *args):
@@ -10,4 +11,4 @@ class MainDisplay(QtWidgets.QWidget):
         Provides a passthrough to underlying widgets.
         """
         super(MainDisplay, self).__init__(*args)
-        uic.loadUi("maindisplay/maindisplay.ui", self)
+        load_ui("maindisplay/maindisplay.ui", self)
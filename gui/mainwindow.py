@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
-from PyQt5 import QtWidgets, uic
 from PyQt5 import QtCore, QtGui, QtWidgets
+from ui_cache import load_ui
 
 
 from maindisplay.maindisplay import MainDisplay
@@ -24,6 +24,7 @@ from alarm_handler import AlarmHandler
 from numpad.numpad import NumPad
 from frozenplots.frozenplots import Cursor
 from messagebar.messagebar import MessageBar
+from startup_profiler import profiler
 
 import pyqtgraph as pg
 import sys
@@ -36,7 +37,7 @@ class MainWindow(QtWidgets.QMainWindow):
         """
 
         super(MainWindow, self).__init__(*args, **kwargs)
-        uic.loadUi('mainwindow.ui', self) # Load the .ui file
+        load_ui('mainwindow.ui', self) # Load the .ui file
 
         self.config = config
         self.esp32 = esp32
@@ -225,18 +226,20 @@ class MainWindow(QtWidgets.QMainWindow):
         '''
         # plot slot widget names
         self.plots = {};
-        for name in config['plots']:
-            plot = self.main.findChild(QtWidgets.QWidget, name)
-            plot.setFixedHeight(130)
-            self.data_filler.connect_plot(name, plot)
-            self.plots[name] = plot
+        with profiler.phase('connect plots'):
+            for name in config['plots']:
+                plot = self.main.findChild(QtWidgets.QWidget, name)
+                plot.setFixedHeight(130)
+                self.data_filler.connect_plot(name, plot)
+                self.plots[name] = plot
 
         # The monitored fields from the default_settings.yaml config file
         self.monitors = {}
-        for name in config['monitors']:
-            monitor = Monitor(name, config)
-            self.monitors[name] = monitor
-            self.data_filler.connect_monitor(monitor)
+        with profiler.phase('build monitors'):
+            for name in config['monitors']:
+                monitor = Monitor(name, config)
+                self.monitors[name] = monitor
+                self.data_filler.connect_monitor(monitor)
 
         # The alarms are from the default_settings.yaml config file
         # self.alarms = {}
@@ -249,8 +252,9 @@ class MainWindow(QtWidgets.QMainWindow):
 
         # Get displayed monitors
         self.monitors_slots = self.main.findChild(QtWidgets.QVBoxLayout, "monitors_slots")
-        self.alarms_settings.connect_monitors(self)
-        self.alarms_settings.populate_monitors()
+        with profiler.phase('populate alarms settings'):
+            self.alarms_settings.connect_monitors(self)
+            self.alarms_settings.populate_monitors()
         self.button_applyalarm.pressed.connect(self.alarms_settings.apply_selected)
         self.button_resetalarm.pressed.connect(self.alarms_settings.reset_selected)
         self.button_offalarm.pressed.connect(self.alarms_settings.move_selected_off)
@@ -273,7 +277,8 @@ class MainWindow(QtWidgets.QMainWindow):
         data directly to the DataFiller, which will
         then display them.
         '''
-        self._data_h = DataHandler(config, self.esp32, self.data_filler, self.gui_alarm)
+        self._data_h = DataHandler(config, self.esp32, self.data_filler,
+                                   self.gui_alarm, self.alarm_h)
 
         self.specialbar.connect_datahandler_config_esp32(self._data_h,
                 self.config, self.esp32, self.messagebar)
@@ -281,7 +286,8 @@ class MainWindow(QtWidgets.QMainWindow):
         '''
         Connect settings button to Settings overlay.
         '''
-        self.settings = Settings(self)
+        with profiler.phase('build settings'):
+            self.settings = Settings(self)
         self.toppane.insertWidget(self.toppane.count(), self.settings)
 
 
@@ -301,8 +307,6 @@ class MainWindow(QtWidgets.QMainWindow):
                 self.toolbar,
                 self.settings)
 
-        if self._start_stop_worker.is_running():
-            self.goto_main()
 
         self.button_startstop.released.connect(self._start_stop_worker.toggle_start_stop)
         self.button_autoassist.released.connect(self._start_stop_worker.toggle_mode)
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
-from PyQt5 import QtWidgets, uic
+from PyQt5 import QtWidgets
 from PyQt5 import QtGui
+from ui_cache import load_ui
 
 class Menu(QtWidgets.QWidget):
     def __init__(self, *args):
@@ -10,7 +11,7 @@ class Menu(QtWidgets.QWidget):
         Grabs child widgets.
         """
         super(Menu, self).__init__(*args)
-        uic.loadUi("menu/menu.ui", self)
+        load_ui("menu/menu.ui", self)
 
 
 
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
-from PyQt5 import QtWidgets, uic
+from PyQt5 import QtWidgets
 from PyQt5 import QtGui, QtCore
+from ui_cache import load_ui
 
 class MessageBar(QtWidgets.QWidget):
     def __init__(self, parent, *args):
@@ -10,7 +11,7 @@ class MessageBar(QtWidgets.QWidget):
         Grabs child widgets.
         """
         super(MessageBar, self).__init__(*args)
-        uic.loadUi("messagebar/messagebar.ui", self)
+        load_ui("messagebar/messagebar.ui", self)
 
         self.mainparent = parent
         self.bottombar = self.mainparent.bottombar
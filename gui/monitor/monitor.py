@@ -1,6 +1,12 @@
 #!/usr/bin/env python3
-from PyQt5 import QtWidgets, uic
+from PyQt5 import QtWidgets
 from PyQt5 import QtGui
+from ui_cache import load_ui
+import logging
+
+log = logging.getLogger(__name__)
+
+
 class Monitor(QtWidgets.QWidget):
     def __init__(self, name, config, *args):
         """
@@ -10,7 +16,7 @@ class Monitor(QtWidgets.QWidget):
 
         """
         super(Monitor, self).__init__(*args)
-        uic.loadUi("monitor/monitor.ui", self)
+        load_ui("monitor/monitor.ui", self)
         self.config = config
         self.configname = name
 
@@ -110,7 +116,7 @@ class Monitor(QtWidgets.QWidget):
         self.label_min.hide()
         self.label_max.hide()
         # if self.alarm is not None:
-        print("Updating thresholds for " + self.configname)
+        log.debug("Updating thresholds for %s", self.configname)
 
         if alarm_min is not None:
             self.label_min.setText(str(alarm_setmin))
@@ -6,6 +6,9 @@ Runs the MVM GUI
 import sys
 import os
 import os.path
+import signal
+import logging
+from startup_profiler import profiler
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtWidgets import QMessageBox
 from PyQt5 import uic
@@ -15,14 +18,24 @@ import yaml
 from mainwindow import MainWindow
 from communication.esp32serial import ESP32Serial
 from communication.fake_esp32serial import FakeESP32Serial
+from communication.esp32simulator import ESP32Simulator
+from communication.esp32transport import ESP32Transport
 from messagebox import MessageBox
+from log_handler import setup_logging
+from gui_config import load_config
+
+log = logging.getLogger(__name__)
 
 def connect_esp32(config):
     try:
         if 'fakeESP32' in sys.argv:
-            print('******* Simulating communication with ESP32')
-            err_msg = "Cannot setup FakeESP32Serial"
-            esp32 = FakeESP32Serial(config)
+            log.info('Simulating communication with ESP32')
+            err_msg = "Cannot setup the ESP32 simulator"
+            if 'nopanel' in sys.argv:
+                esp32 = ESP32Simulator(config)
+            else:
+                # with the panel to control the simulator
+                esp32 = FakeESP32Serial(config)
             esp32.set("wdenable", 1)
         else:
             err_msg = "Cannot communicate with port %s" % config['port']
@@ -37,20 +50,28 @@ def connect_esp32(config):
                             msg.Abort: lambda: None})
         return fn()
 
-    return esp32
+    return ESP32Transport(esp32, config)
 
 
 if __name__ == "__main__":
+    if 'profile_startup' in sys.argv:
+        profiler.enable()
+
     base_dir = os.path.dirname(__file__)
     settings_file = os.path.join(base_dir, 'default_settings.yaml')
 
-    with open(settings_file) as f:
-        config = yaml.load(f, Loader=yaml.FullLoader)
-    print('Config:', yaml.dump(config), sep='\n')
+    with profiler.phase('load config'):
+        config = load_config(settings_file)
+    log_listener, log_ring = setup_logging(config)
+    if log.isEnabledFor(logging.DEBUG):
+        with profiler.phase('dump config'):
+            log.debug('Config:\n%s', yaml.dump(dict(config)))
 
-    app = QtWidgets.QApplication(sys.argv)
+    with profiler.phase('QApplication'):
+        app = QtWidgets.QApplication(sys.argv)
 
-    esp32 = connect_esp32(config)
+    with profiler.phase('connect_esp32'):
+        esp32 = connect_esp32(config)
 
     if esp32 is None:
         exit(-1)
@@ -59,8 +80,35 @@ if __name__ == "__main__":
     watchdog.timeout.connect(esp32.set_watchdog)
     watchdog.start(config["wdinterval"] * 1000)
 
-    window = MainWindow(config, esp32)
-    window.show()
+    stats_file = config.get("link_stats_file")
+    if stats_file and hasattr(signal, "SIGUSR1"):
+        # 'kill -USR1 <pid>' dumps the link counters while running
+        signal.signal(signal.SIGUSR1,
+                      lambda signum, frame: esp32.dump_stats(stats_file))
+
+    with profiler.phase('MainWindow'):
+        window = MainWindow(config, esp32)
+    with profiler.phase('show'):
+        window.show()
+
+    # The start up is over when the event loop gets idle, the
+    # phases completed later are in the report written on exit
+    first_idle = profiler.begin('first event loop')
+    def on_started():
+        profiler.end(first_idle)
+        profiler.dump(config.get('startup_report_file'),
+                      config.get('startup_trace_file'))
+    QtCore.QTimer.singleShot(0, on_started)
+
     app.exec_()
-    esp32.set("wdenable", 0)
+    esp32.stop()
+    esp32.esp32.set("wdenable", 0)
+
+    if stats_file:
+        esp32.dump_stats(stats_file)
+
+    profiler.dump(config.get('startup_report_file'),
+                  config.get('startup_trace_file'))
+
+    log_listener.stop()
 
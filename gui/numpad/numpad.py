@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 from PyQt5 import QtWidgets, uic
 from PyQt5 import QtCore, QtGui, QtWidgets
+import logging
+
+log = logging.getLogger(__name__)
+
 
 class NumPad():
     def __init__(self, mainparent):
@@ -56,7 +60,7 @@ class NumPad():
         if self.input_values == self.code:
             # Execute the code locked function
             if self.func is not None:
-                print("**** Code accepted ****")
+                log.info("Code accepted")
                 self.func()
             # Reassign the code to reset
             self.assign_code(self.code, self.func)
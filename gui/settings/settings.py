@@ -1,22 +1,25 @@
 #!/usr/bin/env python3
-from PyQt5 import QtWidgets, uic
 from PyQt5 import QtCore, QtGui, QtWidgets
+from ui_cache import load_ui
 import os, sys
 import yaml
 import copy
+import logging
 from .settingsfile import SettingsFile
 from presets.presets import Presets
 from messagebox import MessageBox
 
+log = logging.getLogger(__name__)
+
+
 class Settings(QtWidgets.QMainWindow):
     def __init__(self, mainparent, *args):
         """
         Initialized the Settings overlay widget.
         """
         super(Settings, self).__init__(*args)
-        uic.loadUi("settings/settings.ui", self)
+        load_ui("settings/settings.ui", self)
 
-        self._debug = True
         self.mainparent = mainparent
 
         # Get access to parent widgets and data
@@ -185,9 +188,9 @@ class Settings(QtWidgets.QMainWindow):
         # Special operations
         # TODO
         self.label_warning.setVisible(False)
-        self.btn_sw_update.clicked.connect(lambda: print('Sw update button clicked, but not implemented.'))
-        self.btn_restart_os.clicked.connect(lambda: print('OS restart button clicked, but not implemented.'))
-        self.btn_shut_down_os.clicked.connect(lambda: print('OS shut down button clicked, but not implemented.'))
+        self.btn_sw_update.clicked.connect(lambda: log.warning('Sw update button clicked, but not implemented.'))
+        self.btn_restart_os.clicked.connect(lambda: log.warning('OS restart button clicked, but not implemented.'))
+        self.btn_shut_down_os.clicked.connect(lambda: log.warning('OS shut down button clicked, but not implemented.'))
 
 
 
@@ -231,7 +234,7 @@ class Settings(QtWidgets.QMainWindow):
 
         # Restore to previous values
         for param, btn in self._all_spinboxes.items():
-            print('Resetting', param, 'to ', self._current_values[param])
+            log.debug('Resetting %s to %s', param, self._current_values[param])
             btn.setValue(self._current_values[param])
 
         self.repaint()
@@ -310,12 +313,13 @@ class Settings(QtWidgets.QMainWindow):
             else:
                 value = self._current_values[param]
 
-            if 'conversion' in self._config[param]:
-                value = value * self._config[param]['conversion']
-                if self._debug: print('Converting value for', param,
-                    'from', value/self._config[param].get('conversion', 1.), 'to', value)
+            conversion = self._config.param_conversion[param]
+            if conversion != 1.:
+                log.debug('Converting value for %s from %s to %s', param,
+                          value, value * conversion)
+                value = value * conversion
 
-            if self._debug: print('Setting value of', param, ':', value)
+            log.debug('Setting value of %s: %s', param, value)
 
             # Update the value in the config file
             self._config[param]['current'] = self._current_values[param]
@@ -323,22 +327,13 @@ class Settings(QtWidgets.QMainWindow):
             # Set color to red until we know the value has been set.
             btn.setStyleSheet("color: red")
 
-            esp_param_name = self._config['esp_settable_param'][param]
+            esp_param_name = self._config.esp_params[param]
 
             # Finally, try to set the value to the ESP
             # Raise an error message if this fails.
-            try:
-                if self._data_h.set_data(esp_param_name, value):
-                    # Now set the color to green, as we know it has been set
-                    btn.setStyleSheet("color: green")
-            except Exception as error:
-                msg = MessageBox()
-                msg.critical("Critical",
-                             "Severe Hardware Communication Error",
-                             str(error),
-                             "Communication error",
-                             { msg.Retry: lambda: self.send_values_to_hardware,
-                               msg.Abort: lambda: sys.exit(-1) })()
+            self._data_h.set_data(esp_param_name, value,
+                    callback=lambda ok, btn=btn: self._on_value_set(btn, ok),
+                    errback=self._on_set_error)
 
             if param == 'respiratory_rate':
                 self.toolsettings_lookup["respiratory_rate"].update(value)
@@ -352,6 +347,26 @@ class Settings(QtWidgets.QMainWindow):
 
 
 
+    def _on_value_set(self, btn, success):
+        '''
+        Called when the ESP replied to a set command
+        '''
+        if success:
+            # Now set the color to green, as we know it has been set
+            btn.setStyleSheet("color: green")
+
+    def _on_set_error(self, error):
+        '''
+        Called when a set command to the ESP failed
+        '''
+        msg = MessageBox()
+        msg.critical("Critical",
+                     "Severe Hardware Communication Error",
+                     str(error),
+                     "Communication error",
+                     { msg.Retry: lambda: self.send_values_to_hardware,
+                       msg.Abort: lambda: sys.exit(-1) })()
+
     def worker(self):
         '''
         This is called when clicking on a SpinBox
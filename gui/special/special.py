@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
-from PyQt5 import QtWidgets, uic
+from PyQt5 import QtWidgets
 from PyQt5 import QtGui, QtCore
+from ui_cache import load_ui
 from messagebox import MessageBox
+from communication.esp32transport import ESP32Transport
 
 class SpecialBar(QtWidgets.QWidget):
     def __init__(self, *args):
@@ -11,7 +13,7 @@ class SpecialBar(QtWidgets.QWidget):
         Provides a passthrough to underlying widgets.
         """
         super(SpecialBar, self).__init__(*args)
-        uic.loadUi("special/special.ui", self)
+        load_ui("special/special.ui", self)
 
         self.button_expause.pressed.connect(lambda: self.paused_pressed('pause_exhale'))
         self.button_expause.released.connect(lambda: self.paused_released('pause_exhale'))
@@ -35,7 +37,12 @@ class SpecialBar(QtWidgets.QWidget):
         return hasattr(self, "_data_h") and hasattr(self, "_config")
 
     def _get_lung_recruit_eta(self):
-        eta = float(self._esp32.get("pause_lg_time"))
+        self._esp32.get("pause_lg_time", callback=self._on_lung_recruit_eta)
+
+    def _on_lung_recruit_eta(self, eta):
+        if not self._lung_recruit:
+            return
+        eta = float(eta)
         if eta == 0:
             self.stop_lung_recruit()
             self._lung_recruit_timer.stop()
@@ -123,10 +130,11 @@ class SpecialBar(QtWidgets.QWidget):
         Sends signal the appropriate signal the ESP
         to pause inpiration or expiration.
         '''
-        try:
-            if not self._data_h.set_data(mode, int(pause)):
-                raise Exception('Call to set_data failed.')
-        except Exception as error:
+        def on_result(success):
+            if not success:
+                on_error(Exception('Call to set_data failed.'))
+
+        def on_error(error):
             msg = MessageBox()
             fn = msg.critical("Critical",
                               "Severe hardware communication error",
@@ -135,6 +143,10 @@ class SpecialBar(QtWidgets.QWidget):
                               { msg.Ok: lambda: self.stop_timer(mode) })
             fn()
 
+        self._data_h.set_data(mode, int(pause), callback=on_result,
+                              errback=on_error,
+                              priority=ESP32Transport.PRIORITY_STATUS)
+
     def stop_timer(self, mode):
         '''
         Stops the QTimer which sends
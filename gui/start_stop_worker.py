@@ -2,8 +2,13 @@
 A file from class StartStopWorker
 '''
 import sys
+import logging
 from PyQt5.QtCore import QTimer
 from messagebox import MessageBox
+from communication.esp32transport import ESP32Transport
+from startup_profiler import profiler
+
+log = logging.getLogger(__name__)
 
 
 class StartStopWorker():
@@ -36,13 +41,29 @@ class StartStopWorker():
         self._run = self.DONOT_RUN
 
         self._backup_ackowledged = False
-
-        self._esp32_io()
-
-        self._init_settings_panel()
+        self._pending = False
 
         self._timer = QTimer()
         self._timer.timeout.connect(self._esp32_io)
+
+        # Read the ESP status first, the settings panel
+        # and the periodic status checks depend on it
+        self._first_status = profiler.begin('read first status')
+        self._settings_read = None
+        self._call_esp32(then=self._on_first_status)
+
+    def _on_first_status(self):
+        '''
+        Called once the ESP status has been read at start up.
+        '''
+        profiler.end(self._first_status)
+
+        with profiler.phase('init settings panel'):
+            self._init_settings_panel()
+
+        if self.is_running():
+            self._main_window.goto_main()
+
         self._start_timer()
 
     def _init_settings_panel(self):
@@ -64,14 +85,26 @@ class StartStopWorker():
             # If the ESP is running, read the current
             # parameters from the ESP and set those
             # values to the settings panels
-            for param, esp_name in self._config['esp_settable_param'].items():
-                value = float(self._esp32.get(esp_name))
-                print('Reading Settings parameters from ESP:', param, value)
-                if esp_name == 'ratio':
-                    converted_value = (value**-1 - 1)**-1
-                    self._settings.update_spinbox_value(param, converted_value)
-                else:
-                    self._settings.update_spinbox_value(param, value)
+            esp_names = list(self._config['esp_settable_param'].values())
+            self._settings_read = profiler.begin('read settings from ESP')
+            self._esp32.get_many(esp_names, errback=self._on_error,
+                                 priority=ESP32Transport.PRIORITY_SETTINGS,
+                                 callback=self._on_settings_values)
+
+    def _on_settings_values(self, values):
+        '''
+        Called with the parameter values read from the ESP,
+        sets them in the settings panel.
+        '''
+        profiler.end(self._settings_read)
+        for param, esp_name in self._config['esp_settable_param'].items():
+            value = float(values[esp_name])
+            log.debug('Reading Settings parameters from ESP: %s %s', param, value)
+            if esp_name == 'ratio':
+                converted_value = (value**-1 - 1)**-1
+                self._settings.update_spinbox_value(param, converted_value)
+            else:
+                self._settings.update_spinbox_value(param, value)
 
 
     def _esp32_io(self):
@@ -80,22 +113,46 @@ class StartStopWorker():
         QTimer times out.
         '''
 
-        try:
-            self._call_esp32()
-        except Exception as error:
-            self._raise_comm_error(str(error))
+        if self._pending:
+            return
+
+        self._pending = True
+        self._call_esp32()
 
+    def _on_error(self, error):
+        '''
+        Called if the communication with the ESP failed.
+        '''
+        self._pending = False
+        self._raise_comm_error(str(error))
 
-    def _call_esp32(self):
+    def _call_esp32(self, then=None):
         '''
         Gets the run, mode and backup vairables
         from the ESP, and passes them to the
         StartStopWorker class.
+
+        arguments:
+        - then: optional function called after the
+                status has been updated
         '''
 
-        run = int(self._esp32.get('run'))
-        mode = int(self._esp32.get('mode'))
-        backup = int(self._esp32.get('backup'))
+        def on_values(values):
+            self._pending = False
+            self._on_status(int(values['run']),
+                            int(values['mode']),
+                            int(values['backup']))
+            if then is not None:
+                then()
+
+        self._esp32.get_many(['run', 'mode', 'backup'],
+                             callback=on_values, errback=self._on_error)
+
+    def _on_status(self, run, mode, backup):
+        '''
+        Called with the run, mode and backup values
+        read from the ESP.
+        '''
 
         if backup:
             if not self._backup_ackowledged:
@@ -163,8 +220,21 @@ class StartStopWorker():
         Toggles between desired mode (MODE_PCV or MODE_PSV).
         """
         if self._mode == self.MODE_PCV:
-            result = self._esp32.set('mode', self.MODE_PSV)
+            self._esp32.set('mode', self.MODE_PSV,
+                    priority=ESP32Transport.PRIORITY_STATUS,
+                    callback=lambda result: self._on_mode_set(result, self.MODE_PSV),
+                    errback=lambda error: self._raise_comm_error(str(error)))
+        else:
+            self._esp32.set('mode', self.MODE_PCV,
+                    priority=ESP32Transport.PRIORITY_STATUS,
+                    callback=lambda result: self._on_mode_set(result, self.MODE_PCV),
+                    errback=lambda error: self._raise_comm_error(str(error)))
 
+    def _on_mode_set(self, result, mode):
+        """
+        Called when the ESP replied to the mode change.
+        """
+        if mode == self.MODE_PSV:
             if result:
                 self._mode_text = "PSV"
                 self._button_autoassist.setText("Set\nPCV")
@@ -174,8 +244,6 @@ class StartStopWorker():
                 self._raise_comm_error('Cannot set PSV mode.')
 
         else:
-            result = self._esp32.set('mode', self.MODE_PCV)
-
             if result:
                 self._mode_text = "PCV"
                 self._button_autoassist.setText("Set\nPSV")
@@ -201,8 +269,15 @@ class StartStopWorker():
         Callback for when the Start button is pressed
         '''
         # Send signal to ESP to start running
-        result = self._esp32.set('run', self.DO_RUN)
+        self._esp32.set('run', self.DO_RUN,
+                        priority=ESP32Transport.PRIORITY_STATUS,
+                        callback=self._on_start_result,
+                        errback=lambda error: self._raise_comm_error(str(error)))
 
+    def _on_start_result(self, result):
+        '''
+        Called when the ESP replied to the start command
+        '''
         if result:
             self._run = self.DO_RUN
             self.show_stop_button()
@@ -233,8 +308,15 @@ class StartStopWorker():
         Callback for when the Stop button is pressed
         '''
         # Send signal to ESP to stop running
-        result = self._esp32.set('run', self.DONOT_RUN)
+        self._esp32.set('run', self.DONOT_RUN,
+                        priority=ESP32Transport.PRIORITY_STATUS,
+                        callback=self._on_stop_result,
+                        errback=lambda error: self._raise_comm_error(str(error)))
 
+    def _on_stop_result(self, result):
+        '''
+        Called when the ESP replied to the stop command
+        '''
         if result:
             self._run = self.DONOT_RUN
             self.show_start_button()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+'''
+Times the phases of the GUI start up.
+
+The profiler is disabled by default, and then costs a flag check per
+phase. When enabled (start the GUI with the 'profile_startup' argument)
+each phase is timed, e.g.
+
+```
+from startup_profiler import profiler
+
+with profiler.phase('connect_esp32'):
+    esp32 = connect_esp32(config)
+```
+
+Phases that complete in a callback are timed with begin() and end().
+The phases are then ranked by the time spent in them, not counting the
+nested phases, and also written as a Chrome trace (to be opened with
+chrome://tracing or https://ui.perfetto.dev).
+'''
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+
+class StartupProfiler():
+    '''
+    Records the start and end time of named phases.
+
+    Attributes:
+        enabled (bool) True if the phases are recorded
+    '''
+
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        self.enabled = False
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        # (name, category, start, end, thread id), in seconds
+        self._phases = []
+        # the phases timed with begin() and end(), which run
+        # concurrently with the others instead of enclosing them
+        self._spans = set()
+
+    def enable(self):
+        '''
+        Starts recording the phases. The time since the profiler
+        was created (i.e. imported) is recorded as the 'imports' phase.
+        '''
+        self.enabled = True
+        self._record('imports', 'startup', self._origin, time.perf_counter())
+
+    @contextmanager
+    def phase(self, name, category='startup'):
+        '''
+        Times the enclosed code
+
+        arguments:
+        - name: the phase name
+        - category: the phase category, e.g. 'ui' for the .ui files
+        '''
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, category, start, time.perf_counter())
+
+    def begin(self, name, category='startup'):
+        '''
+        Starts a phase that ends in another function
+
+        arguments:
+        - name: the phase name
+        - category: the phase category
+
+        returns: the token to pass to end(), None if disabled
+        '''
+        if not self.enabled:
+            return None
+        return (name, category, time.perf_counter())
+
+    def end(self, token):
+        '''
+        Ends a phase started with begin()
+
+        arguments:
+        - token: the value returned by begin()
+        '''
+        if token is None:
+            return
+        name, category, start = token
+        phase = self._record(name, category, start, time.perf_counter())
+        with self._lock:
+            self._spans.add(phase)
+
+    def _record(self, name, category, start, end):
+        '''
+        Stores a completed phase, and returns it
+        '''
+        phase = (name, category, start, end, threading.get_ident())
+        with self._lock:
+            self._phases.append(phase)
+        return phase
+
+    def _self_times(self):
+        '''
+        Returns the time of each phase not spent in the phases
+        nested in it, computed per thread from the start and end
+        times. The phases timed with begin() and end() are not
+        nested in the others, and the others are not nested in them.
+        '''
+        with self._lock:
+            phases = sorted(self._phases, key=lambda p: (p[4], p[2], -p[3]))
+            spans = set(self._spans)
+
+        self_times = []
+        stack = []
+        for phase in phases:
+            name, category, start, end, thread = phase
+            if phase in spans:
+                self_times.append(phase + ([end - start],))
+                continue
+            while stack and (stack[-1][4] != thread or stack[-1][3] <= start):
+                stack.pop()
+            if stack and end <= stack[-1][3]:
+                stack[-1][5][0] -= end - start
+            entry = (name, category, start, end, thread, [end - start])
+            self_times.append(entry)
+            stack.append(entry)
+
+        return [(name, category, end - start, remaining[0])
+                for name, category, start, end, _, remaining in self_times]
+
+    def report(self):
+        '''
+        Returns the phases ranked by self time, summed by name, as text
+        '''
+        totals = {}
+        for name, category, total, own in self._self_times():
+            count, all_time, self_time = totals.get(name, (0, 0., 0.))
+            totals[name] = (count + 1, all_time + total, self_time + own)
+
+        lines = ['%10s %10s %6s  %s' % ('self ms', 'total ms', 'count', 'phase')]
+        ranked = sorted(totals.items(), key=lambda item: -item[1][2])
+        for name, (count, all_time, self_time) in ranked:
+            lines.append('%10.1f %10.1f %6d  %s' %
+                         (self_time * 1e3, all_time * 1e3, count, name))
+        return '\n'.join(lines)
+
+    def trace(self):
+        '''
+        Returns the phases as a Chrome trace ("Trace Event Format")
+        '''
+        with self._lock:
+            phases = list(self._phases)
+
+        pid = os.getpid()
+        events = [{
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': (start - self._origin) * 1e6,
+            'dur': (end - start) * 1e6,
+            'pid': pid,
+            'tid': thread,
+        } for name, category, start, end, thread in phases]
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, report_file=None, trace_file=None):
+        '''
+        Logs the report and writes the report
+        and the Chrome trace files, if given
+
+        arguments:
+        - report_file: the path of the ranked report
+        - trace_file: the path of the Chrome trace JSON
+        '''
+        if not self.enabled:
+            return
+
+        report = self.report()
+        log.info('Startup phases:\n%s', report)
+
+        if report_file:
+            with open(report_file, 'w') as f:
+                f.write(report + '\n')
+        if trace_file:
+            with open(trace_file, 'w') as f:
+                json.dump(self.trace(), f)
+
+
+# The profiler of this process
+profiler = StartupProfiler()
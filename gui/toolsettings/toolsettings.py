@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
-from PyQt5 import QtWidgets, uic
+from PyQt5 import QtWidgets
 from PyQt5 import QtGui
+from ui_cache import load_ui
 
 class ToolSettings(QtWidgets.QWidget):
     def __init__(self, *args):
@@ -10,7 +11,7 @@ class ToolSettings(QtWidgets.QWidget):
         Grabs child widgets and and connects slider value to text value.
         """
         super(ToolSettings, self).__init__(*args)
-        uic.loadUi("toolsettings/toolsettings.ui", self)
+        load_ui("toolsettings/toolsettings.ui", self)
         self.label_name = self.findChild(QtWidgets.QLabel, "label_name")
         self.label_value = self.findChild(QtWidgets.QLabel, "label_value")
         self.slider_value = self.findChild(QtWidgets.QProgressBar, "slider_value")
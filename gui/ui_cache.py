@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+'''
+Loads the Qt Designer .ui files from precompiled form classes.
+
+uic.loadUi() parses the XML of a .ui file every time a widget is built.
+load_ui() compiles each file once with uic.compileUi(), keeps the
+resulting form class in memory, and stores its byte code on disk, next
+to the .ui file in __pycache__, so that the following runs skip the
+XML parsing too. A cached file is used only if it was compiled from a
+.ui file with the same modification time and size, by the same Python
+and PyQt versions.
+
+The cache can be filled in advance (e.g. when building an image) with
+
+```
+python ui_cache.py
+```
+'''
+
+import io
+import os
+import sys
+import marshal
+import logging
+import importlib.util
+from PyQt5 import uic
+from PyQt5.QtCore import PYQT_VERSION_STR
+from startup_profiler import profiler
+
+log = logging.getLogger(__name__)
+
+# The form classes already loaded, by .ui path
+_forms = {}
+
+
+def _cache_path(path):
+    '''
+    Returns the path of the compiled form of a .ui file
+    '''
+    directory, name = os.path.split(path)
+    name = '%s.%s.pyc' % (name, sys.implementation.cache_tag)
+    return os.path.join(directory, '__pycache__', name)
+
+
+def _signature(path):
+    '''
+    Returns what a compiled form must match to be used: the versions
+    of the tools, the path as given (the icon paths in the generated
+    code are relative to it) and the .ui modification time and size
+    '''
+    stat = os.stat(path)
+    return (importlib.util.MAGIC_NUMBER, PYQT_VERSION_STR,
+            path, stat.st_mtime_ns, stat.st_size)
+
+
+def _read_cache(path, signature):
+    '''
+    Returns the cached code of a .ui file, or None
+    if missing or out of date
+    '''
+    try:
+        with open(_cache_path(path), 'rb') as f:
+            cached_signature, code = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+    if cached_signature != signature:
+        return None
+    return code
+
+
+def _write_cache(path, signature, code):
+    '''
+    Stores the code of a .ui file, atomically. A read-only
+    file system only costs the compilation on each run.
+    '''
+    cache = _cache_path(path)
+    temporary = '%s.%d' % (cache, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        with open(temporary, 'wb') as f:
+            marshal.dump((signature, code), f)
+        os.replace(temporary, cache)
+    except OSError as error:
+        log.debug('Cannot store the compiled %s: %s', path, error)
+
+
+def compile_ui(path):
+    '''
+    Returns the code object of the form class of a
+    .ui file, from the disk cache or compiling it
+
+    arguments:
+    - path: the .ui file path
+    '''
+    signature = _signature(path)
+    code = _read_cache(path, signature)
+    if code is None:
+        log.debug('Compiling %s', path)
+        source = io.StringIO()
+        uic.compileUi(path, source)
+        code = compile(source.getvalue(), path, 'exec')
+        _write_cache(path, signature, code)
+    return code
+
+
+def form_class(path):
+    '''
+    Returns the form class (the Ui_* class generated by
+    uic) of a .ui file, loading it only once
+
+    arguments:
+    - path: the .ui file path
+    '''
+    form = _forms.get(path)
+    if form is None:
+        namespace = {}
+        exec(compile_ui(path), namespace)
+        form = next(value for name, value in namespace.items()
+                    if name.startswith('Ui_') and isinstance(value, type))
+        _forms[path] = form
+    return form
+
+
+def load_ui(path, widget):
+    '''
+    Same as uic.loadUi(path, widget): builds the content of
+    a .ui file in the widget, and makes its children
+    attributes of the widget
+
+    arguments:
+    - path: the .ui file path
+    - widget: the widget to set up
+
+    returns: the widget
+    '''
+    with profiler.phase('load_ui %s' % path, 'ui'):
+        form = form_class(path)()
+        form.setupUi(widget)
+        for name, child in vars(form).items():
+            setattr(widget, name, child)
+    return widget
+
+
+if __name__ == '__main__':
+    # Compile all the .ui files under this directory
+    base = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(base)
+    for directory, _, files in os.walk('.'):
+        for name in sorted(files):
+            if name.endswith('.ui'):
+                path = os.path.relpath(os.path.join(directory, name))
+                compile_ui(path)
+                print(path)
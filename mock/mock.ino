@@ -68,6 +68,72 @@ size_t send(Stream& connection, String const& data)
   return sent;
 }
 
+// CRC16-CCITT, polynomial 0x1021, initial value 0xFFFF
+uint16_t crc16(uint8_t const* data, size_t len, uint16_t crc = 0xFFFF)
+{
+  for (size_t i = 0; i < len; ++i) {
+    crc ^= uint16_t(data[i]) << 8;
+    for (int bit = 0; bit < 8; ++bit) {
+      crc = crc & 0x8000 ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+// binary frame:
+//   0xAA 0x55 | length (uint16 LE) | float32 LE values |
+//   uint32 LE words | CRC16 (LE)
+// the CRC covers the length, the values and the words
+size_t send_frame(Stream& connection, float const* values, uint16_t n,
+                  uint32_t const* words, uint16_t n_words)
+{
+  uint16_t const len = n * sizeof(float) + n_words * sizeof(uint32_t);
+  uint8_t const header[] = { 0xAA, 0x55, uint8_t(len & 0xFF), uint8_t(len >> 8) };
+  auto const payload = reinterpret_cast<uint8_t const*>(values);
+  auto const word_bytes = reinterpret_cast<uint8_t const*>(words);
+
+  auto crc = crc16(header + 2, 2);
+  crc = crc16(payload, n * sizeof(float), crc);
+  crc = crc16(word_bytes, n_words * sizeof(uint32_t), crc);
+  uint8_t const trailer[] = { uint8_t(crc & 0xFF), uint8_t(crc >> 8) };
+
+  auto sent = connection.write(header, sizeof(header));
+  sent += connection.write(payload, n * sizeof(float));
+  sent += connection.write(word_bytes, n_words * sizeof(uint32_t));
+  sent += connection.write(trailer, sizeof(trailer));
+
+  return sent;
+}
+
+// streamed frame, pushed periodically after "set stream <rate>":
+//   0xAA 0x56 | length (uint16 LE) | millis (uint32 LE) |
+//   float32 LE values | uint32 LE words | CRC16 (LE)
+size_t send_stream_frame(Stream& connection, uint32_t timestamp,
+                         float const* values, uint16_t n,
+                         uint32_t const* words, uint16_t n_words)
+{
+  uint16_t const len
+    = sizeof(timestamp) + n * sizeof(float) + n_words * sizeof(uint32_t);
+  uint8_t const header[] = { 0xAA, 0x56, uint8_t(len & 0xFF), uint8_t(len >> 8) };
+  auto const time_bytes = reinterpret_cast<uint8_t const*>(&timestamp);
+  auto const payload = reinterpret_cast<uint8_t const*>(values);
+  auto const word_bytes = reinterpret_cast<uint8_t const*>(words);
+
+  auto crc = crc16(header + 2, 2);
+  crc = crc16(time_bytes, sizeof(timestamp), crc);
+  crc = crc16(payload, n * sizeof(float), crc);
+  crc = crc16(word_bytes, n_words * sizeof(uint32_t), crc);
+  uint8_t const trailer[] = { uint8_t(crc & 0xFF), uint8_t(crc >> 8) };
+
+  auto sent = connection.write(header, sizeof(header));
+  sent += connection.write(time_bytes, sizeof(timestamp));
+  sent += connection.write(payload, n * sizeof(float));
+  sent += connection.write(word_bytes, n_words * sizeof(uint32_t));
+  sent += connection.write(trailer, sizeof(trailer));
+
+  return sent;
+}
+
 using alarm_t = uint32_t;
 
 alarm_t raise_hw_alarm(int num, alarm_t alarm)
@@ -97,6 +163,10 @@ alarm_t set_gui_alarm(alarm_t alarm)
 mvm::alarm_t alarm_status = 0;
 mvm::alarm_t warning_status = 0;
 
+// streaming period in ms, 0 when not streaming
+unsigned long stream_period = 0;
+unsigned long stream_next = 0;
+
 unsigned long pause_lg_expiration = mvm::now<mvm::Seconds>() + 10;
 unsigned long gui_watchdog_expr = mvm::now<mvm::Seconds>() + 5;
 
@@ -130,6 +200,40 @@ void setup()
   parameters["pause_lg_p"]       = String(10);
 }
 
+// the values returned by "get all", in the get_all_fields order
+size_t const n_all_fields = 13;
+
+void fill_all(float* values)
+{
+  values[0]  = random(20, 70);     // pressure
+  values[1]  = random(3, 21);      // flow
+  values[2]  = random(30, 100);    // o2
+  values[3]  = random(6, 8);       // bpm
+  values[4]  = random(1000, 1500); // tidal
+  values[5]  = random(4, 20);      // peep
+  values[6]  = random(10, 50);     // temperature
+  values[7]  = random(0, 1);       // power_mode
+  values[8]  = random(20, 100);    // battery
+  values[9]  = random(70, 80);     // peak
+  values[10] = random(1000, 2000); // total_inspired_volume
+  values[11] = random(1000, 2000); // total_expired_volume
+  values[12] = random(10, 100);    // volume_minute
+}
+
+// the words returned by "get all" after the values, in the
+// get_all_words order. Set it to true to send them, with
+// "get_all_words: [alarm, warning]" in the GUI settings
+bool const send_all_words = false;
+
+size_t const max_all_words = 2;
+size_t const n_all_words = send_all_words ? max_all_words : 0;
+
+void fill_words(uint32_t* words)
+{
+  words[0] = alarm_status;
+  words[1] = warning_status;
+}
+
 // this is tricky, didn't had the time to think a better algo
 String parse_word(String const& command)
 {
@@ -169,6 +273,11 @@ String set(String const& command)
   } else if (name == "_hwwarning") {
     warning_status = mvm::raise_hw_alarm(value.toInt(), warning_status);
     return "OK";
+  } else if (name == "stream") {
+    auto const rate = value.toInt();
+    stream_period = rate > 0 ? 1000ul / rate : 0;
+    stream_next = millis();
+    return "OK";
   } else if (name == "wdenable" && value == "1") {
     gui_watchdog_expr = mvm::now<mvm::Seconds>() + 5;
     alarm_status = mvm::snooze_hw_alarm(30, alarm_status);
@@ -190,20 +299,27 @@ String get(String const& command)
   auto const name = parse_word(command);
 
   if (name == "all") {
-    return
-        String(random(20, 70))     + "," // pressure
-      + String(random(3, 21))      + "," // flow
-      + String(random(30, 100))    + "," // o2
-      + String(random(6, 8))       + "," // bpm
-      + String(random(1000, 1500)) + "," // tidal
-      + String(random(4, 20))      + "," // peep
-      + String(random(10, 50))     + "," // temperature
-      + String(random(0, 1))       + "," // power_mode
-      + String(random(20, 100))    + "," // battery
-      + String(random(70, 80))     + "," // peak
-      + String(random(1000, 2000)) + "," // total_inspired_volume
-      + String(random(1000, 2000)) + "," // total_expired_volume
-      + String(random(10, 100));         // volume_minute
+    float values[n_all_fields];
+    fill_all(values);
+
+    uint32_t words[max_all_words];
+    fill_words(words);
+
+    String result;
+    for (size_t i = 0; i < n_all_fields; ++i) {
+      if (i != 0) {
+        result += ",";
+      }
+      result += String(values[i]);
+    }
+    for (size_t i = 0; i < n_all_words; ++i) {
+      result += ",";
+      result += String(words[i]);
+    }
+    return result;
+  } else if (name == "binary") {
+    // binary frames are supported, with this number of values and words
+    return String(n_all_fields + n_all_words);
   } else if (name == "pause_lg_time") {
     auto const now = mvm::now<mvm::Seconds>();
     return now > pause_lg_expiration ? "0" : String(pause_lg_expiration - now);
@@ -228,6 +344,33 @@ String get(String const& command)
   }
 }
 
+// replies to "get_many name1 name2 ..." with the comma separated values,
+// in the same order as the requested names
+String get_many(String const& command)
+{
+  String result;
+  auto start = command.indexOf(separator);
+
+  while (start != -1) {
+    auto const end = command.indexOf(separator, start + 1);
+    auto const name
+      = end == -1
+      ? command.substring(start + 1)
+      : command.substring(start + 1, end);
+
+    if (name.length() != 0) {
+      if (result.length() != 0) {
+        result += ",";
+      }
+      result += get("get " + name);
+    }
+
+    start = end;
+  }
+
+  return result;
+}
+
 void serial_loop(Stream& connection)
 {
   if (connection.available() > 0) {
@@ -236,6 +379,14 @@ void serial_loop(Stream& connection)
     auto const command_type = command.substring(0, 3);
 
     if (command.length() == 0) {
+    } else if (command == "get all_bin") {
+      float values[n_all_fields];
+      fill_all(values);
+      uint32_t words[max_all_words];
+      fill_words(words);
+      mvm::send_frame(connection, values, n_all_fields, words, n_all_words);
+    } else if (command.startsWith("get_many")) {
+      mvm::send(connection, get_many(command));
     } else if (command_type == "get") {
       mvm::send(connection, get(command));
     } else if (command_type == "set") {
@@ -251,6 +402,16 @@ void loop()
   serial_loop(Serial);
   serial_loop(Debug);
 
+  if (stream_period != 0 && millis() >= stream_next) {
+    stream_next += stream_period;
+    float values[n_all_fields];
+    fill_all(values);
+    uint32_t words[max_all_words];
+    fill_words(words);
+    mvm::send_stream_frame(Serial, millis(), values, n_all_fields,
+                           words, n_all_words);
+  }
+
   if (parameters["wdenable"] == "1") {
     auto const now = mvm::now<mvm::Seconds>();
     if (now > gui_watchdog_expr) {